@@ -0,0 +1,173 @@
+# analytics.py
+# Vectorized computations over fetched reservation rows. These work on whole
+# columns at once so a year of reservations is processed in a single pass.
+import numpy as np
+import pandas as pd
+
+DEFAULT_DURATION = 120
+MINUTES_PER_DAY = 24 * 60
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+
+def minutes_of_day(times):
+    # Times are stored as minutes of the day
+    return np.asarray(times, dtype=np.int64)
+
+
+def weekdays_of(dates):
+    # Monday = 0; day numbers count from 1970-01-01, a Thursday
+    return (np.asarray(dates, dtype=np.int64) + 3) % 7
+
+
+def slot_labels(slot_minutes):
+    return [f"{m // 60:02d}:{m % 60:02d}" for m in range(0, MINUTES_PER_DAY, slot_minutes)]
+
+
+def occupancy_heatmap(dates, times, durations, slot_minutes=60, start_date=None, end_date=None, row_counts=None):
+    # Weekday x slot grid counting every reservation in each slot its duration
+    # covers. With a date range, counts are averaged per occurrence of each
+    # weekday. row_counts gives the number of reservations each row stands for.
+    if MINUTES_PER_DAY % slot_minutes:
+        raise ValueError("slot_minutes must divide a day evenly")
+    slots_per_day = MINUTES_PER_DAY // slot_minutes
+    grid_size = 7 * slots_per_day
+
+    weekdays = weekdays_of(dates)
+    starts = minutes_of_day(times)
+    durations = pd.Series(durations, dtype='float').fillna(DEFAULT_DURATION).to_numpy().astype(int)
+    durations = np.maximum(durations, 1)
+
+    # Number of slots touched by [start, start + duration)
+    first_slot = starts // slot_minutes
+    last_slot = (starts + durations - 1) // slot_minutes
+    spans = last_slot - first_slot + 1
+
+    # Expand each reservation into its covered cells without a Python loop;
+    # cells past midnight wrap into the next weekday
+    cell_starts = weekdays * slots_per_day + first_slot
+    offsets = np.arange(spans.sum()) - np.repeat(np.cumsum(spans) - spans, spans)
+    cells = (np.repeat(cell_starts, spans) + offsets) % grid_size
+    weights = np.repeat(np.asarray(row_counts, dtype=float), spans) if row_counts is not None else None
+    counts = np.bincount(cells, weights=weights, minlength=grid_size).reshape(7, slots_per_day).astype(float)
+
+    if start_date is not None and end_date is not None:
+        days = pd.date_range(start_date, end_date, freq='D').dayofweek
+        occurrences = np.bincount(days, minlength=7)
+        counts = np.divide(counts, occurrences[:, None], out=np.zeros_like(counts), where=occurrences[:, None] > 0)
+
+    return pd.DataFrame(counts, index=WEEKDAYS, columns=slot_labels(slot_minutes))
+
+
+# Opening hours of each service period, in minutes of the day
+SERVICE_PERIODS = {
+    'Lunch': (11 * 60, 15 * 60),
+    'Dinner': (17 * 60, 22 * 60),
+}
+
+
+def merged_minutes(keys, starts, ends, key_count):
+    # Sweep-line interval merge: total minutes covered per integer key, counting
+    # overlapping intervals once. Rows must be sorted by (key, start).
+    if len(starts) == 0:
+        return np.zeros(key_count)
+    # Offsetting each key by more than a day keeps a single running maximum
+    # from leaking across keys
+    offset = keys.astype(np.int64) * 4 * MINUTES_PER_DAY
+    shifted_starts = starts + offset
+    running_end = np.maximum.accumulate(ends + offset)
+    new_block = np.r_[True, shifted_starts[1:] >= running_end[:-1]]
+    block_firsts = np.flatnonzero(new_block)
+    block_lengths = np.maximum.reduceat(ends + offset, block_firsts) - shifted_starts[block_firsts]
+    return np.bincount(keys[block_firsts], weights=block_lengths, minlength=key_count)
+
+
+def table_day_minutes(table_codes, day_codes, starts, ends, guests, table_count, day_count,
+                      service_periods=SERVICE_PERIODS):
+    # {period: (booked seat-minutes, occupied minutes)}, each shaped
+    # (table_count, day_count); occupied minutes count overlaps once
+    minutes = {}
+    for period, (open_minute, close_minute) in service_periods.items():
+        # Clip every reservation to the period in one vectorized step
+        clipped_start = np.clip(starts, open_minute, close_minute)
+        clipped_end = np.clip(ends, open_minute, close_minute)
+        in_period = clipped_end > clipped_start
+
+        # Sort once by (table, day, start) using integer codes
+        order = np.lexsort((clipped_start[in_period], day_codes[in_period], table_codes[in_period]))
+        period_tables = table_codes[in_period][order]
+        period_starts = clipped_start[in_period][order]
+        period_ends = clipped_end[in_period][order]
+        period_guests = guests[in_period][order]
+
+        # Merge overlaps per table and day
+        table_days = period_tables.astype(np.int64) * day_count + day_codes[in_period][order]
+        booked = np.bincount(
+            table_days, weights=period_guests * (period_ends - period_starts), minlength=table_count * day_count
+        )
+        occupied = merged_minutes(table_days, period_starts, period_ends, table_count * day_count)
+        minutes[period] = (booked.reshape(table_count, day_count), occupied.reshape(table_count, day_count))
+    return minutes
+
+
+def seat_hour_utilization(reservations, tables, start_date, end_date, service_periods=SERVICE_PERIODS,
+                          rollup=None):
+    # Seat-hours booked (party size x time) and occupied (table capacity x time
+    # the table is in use) against seat-hours available, per table and period.
+    # reservations: table_key, date, time, duration, guest_count
+    # tables: table_key, table, section, capacity
+    # rollup: table_key, period, booked_seat_minutes, occupied_minutes already
+    # totalled for days that have no rows in reservations
+    days = len(pd.date_range(start_date, end_date, freq='D'))
+    starts = minutes_of_day(reservations['time'])
+    durations = reservations['duration'].astype('float').fillna(DEFAULT_DURATION).to_numpy()
+    ends = starts + durations
+    guests = reservations['guest_count'].to_numpy().astype(float)
+
+    # Integer codes for tables and days; reservations on unknown tables are dropped
+    table_keys = tables['table_key'].to_numpy()
+    table_codes = pd.Index(table_keys).get_indexer(reservations['table_key'])
+    known = table_codes >= 0
+    day_codes, day_values = pd.factorize(reservations['date'].astype(str))
+    day_count = max(len(day_values), 1)
+    starts, ends, guests = starts[known], ends[known], guests[known]
+    table_codes, day_codes = table_codes[known], day_codes[known]
+    minutes = table_day_minutes(
+        table_codes, day_codes, starts, ends, guests, len(table_keys), day_count, service_periods,
+    )
+
+    frames = []
+    for period, (open_minute, close_minute) in service_periods.items():
+        booked, occupied = (values.sum(axis=1) for values in minutes[period])
+        if rollup is not None:
+            period_rollup = rollup[rollup['period'] == period]
+            rollup_codes = pd.Index(table_keys).get_indexer(period_rollup['table_key'])
+            known_rollup = rollup_codes >= 0
+            booked = booked + np.bincount(rollup_codes[known_rollup], minlength=len(table_keys),
+                                          weights=period_rollup['booked_seat_minutes'].to_numpy()[known_rollup])
+            occupied = occupied + np.bincount(rollup_codes[known_rollup], minlength=len(table_keys),
+                                              weights=period_rollup['occupied_minutes'].to_numpy()[known_rollup])
+
+        period_frame = tables[['table_key', 'table', 'section', 'capacity']].copy()
+        period_frame['period'] = period
+        period_frame['available_seat_hours'] = period_frame['capacity'] * (close_minute - open_minute) / 60 * days
+        period_frame['booked_seat_hours'] = booked / 60
+        period_frame['occupied_seat_hours'] = occupied / 60 * period_frame['capacity'].to_numpy()
+        frames.append(period_frame)
+
+    per_table = pd.concat(frames, ignore_index=True)
+
+    def summarize(group_columns):
+        summary = per_table.groupby(group_columns, as_index=False, sort=False)[
+            ['available_seat_hours', 'booked_seat_hours', 'occupied_seat_hours']
+        ].sum()
+        available = summary['available_seat_hours'].where(summary['available_seat_hours'] > 0)
+        # Seats actually filled vs. seats held by occupied tables
+        summary['utilization'] = (summary['booked_seat_hours'] / available).fillna(0.0)
+        summary['occupancy'] = (summary['occupied_seat_hours'] / available).fillna(0.0)
+        return summary
+
+    return {
+        'table': summarize(['section', 'table', 'period']),
+        'section': summarize(['section']),
+        'period': summarize(['period']),
+    }
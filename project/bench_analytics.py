@@ -0,0 +1,155 @@
+# bench_analytics.py
+# Analytics benchmark: fills a throwaway database with synthetic history,
+# builds the columnar store from it and times a year-range dashboard render
+# on the SQLite snapshot and on the columnar backend.
+#
+#   python bench_analytics.py --rows 20000000 --years 5
+import argparse
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time as time_module
+from datetime import date, timedelta
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+INSERT_CHUNK = 200000
+
+# Functions the analytics page calls for one render
+DASHBOARD = [
+    'fetch_key_metrics',
+    'get_daily_reservations',
+    'get_party_size_distribution',
+    'get_section_reservations',
+    'get_occupancy_heatmap',
+    'get_seat_hour_utilization',
+]
+
+
+def fill_database(db_path, rows, years, seed):
+    # Synthetic reservations spread over the last `years` years, written as
+    # the encoded integer columns
+    generator = np.random.default_rng(seed)
+    today = (date.today() - date(1970, 1, 1)).days
+    connection = sqlite3.connect(db_path)
+    try:
+        connection.execute("INSERT INTO customers (name, email, phone) VALUES ('Benchmark', 'bench@example.com', '0')")
+        customer_id = connection.execute("SELECT id FROM customers WHERE email = 'bench@example.com'").fetchone()[0]
+        table_ids = [row[0] for row in connection.execute("SELECT id FROM tables")]
+        for offset in range(0, rows, INSERT_CHUNK):
+            size = min(INSERT_CHUNK, rows - offset)
+            days = np.sort(generator.integers(today - years * 365, today, size))
+            times = generator.integers(11 * 4, 22 * 4, size) * 15
+            durations = generator.choice([90, 120, 150], size)
+            guests = generator.integers(1, 9, size)
+            tables = generator.choice(table_ids, size)
+            connection.executemany(
+                "INSERT INTO reservations (date, time, duration, table_id, customer_id, guest_count, status) "
+                "VALUES (?, ?, ?, ?, ?, ?, 2)",
+                zip(days.tolist(), times.tolist(), durations.tolist(), tables.tolist(),
+                    [customer_id] * size, guests.tolist()),
+            )
+            connection.commit()
+    finally:
+        connection.close()
+
+
+def timed(fn):
+    started = time_module.perf_counter()
+    result = fn()
+    return time_module.perf_counter() - started, result
+
+
+def time_dashboard(app, filters, repeats):
+    # Best of `repeats` renders per function, in milliseconds
+    timings = {}
+    for name in DASHBOARD:
+        function = getattr(app, name)
+        best = None
+        for _ in range(repeats):
+            with app.analytics_connections(None) as connections:
+                seconds, _ = timed(lambda: function(filters, None, connections))
+            best = seconds if best is None else min(best, seconds)
+        timings[name] = best * 1000
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time year-range analytics on SQLite and the columnar store.")
+    parser.add_argument('--rows', type=int, default=2000000, help="Synthetic reservations to generate")
+    parser.add_argument('--years', type=int, default=5, help="Years of history the rows are spread over")
+    parser.add_argument('--repeats', type=int, default=3, help="Renders per function; the best is reported")
+    parser.add_argument('--skip-sqlite', action='store_true', help="Only time the columnar backend")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--keep', action='store_true', help="Keep the generated data directory")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='restaurant_bench_')
+    data_dir = os.path.join(work_dir, 'data')
+    os.makedirs(data_dir)
+    os.environ['RESTAURANT_DATA_DIR'] = data_dir
+    os.environ['ANALYTICS_BACKEND'] = 'columnar'
+    os.environ['RESTAURANT_SCHEDULER'] = '0'
+    os.environ.setdefault('STREAMLIT_LOGGER_LEVEL', 'error')
+    sys.path.insert(0, BASE_DIR)
+    import main as app
+
+    app.init_db()
+    app.ensure_schema()
+    db_path = app.router.path_for(app.router.default_location)
+
+    seconds, _ = timed(lambda: fill_database(db_path, args.rows, args.years, args.seed))
+    print(f"Generated {args.rows:,} reservations over {args.years} years in {seconds:.1f}s")
+
+    store = app.columnar_stores.get()
+    seconds, _ = timed(lambda: app.snapshots.refresh())
+    print(f"Snapshot: {seconds:.1f}s")
+    seconds, months = timed(store.refresh)
+    print(f"Columnar build: {months} months in {seconds:.1f}s "
+          f"({sum(os.path.getsize(os.path.join(store.store_dir, name)) for name in os.listdir(store.store_dir)) / 1e6:.0f} MB)")
+
+    # A few new bookings only touch the current month
+    connection = sqlite3.connect(db_path)
+    today = (date.today() - date(1970, 1, 1)).days
+    connection.executemany(
+        "INSERT INTO reservations (date, time, duration, table_id, customer_id, guest_count, status) "
+        "SELECT ?, 1140, 120, 1, id, 2, 1 FROM customers WHERE email = 'bench@example.com'",
+        [(today,)] * 100,
+    )
+    connection.commit()
+    connection.close()
+    app.snapshots.refresh()
+    seconds, months = timed(store.refresh)
+    print(f"Incremental refresh after 100 new bookings: {months} month(s) in {seconds:.2f}s")
+
+    end_date = date.today()
+    filters = app.AnalyticsFilter(end_date - timedelta(days=365), end_date, "All Sections", 1, 20)
+    # The first call loads the columns into memory, as the first render after a refresh does
+    seconds, _ = timed(store.columns)
+    print(f"Column load: {seconds:.2f}s")
+
+    results = {'columnar': time_dashboard(app, filters, args.repeats)}
+    if not args.skip_sqlite:
+        stores = app.columnar_stores
+        app.columnar_stores = None
+        results['sqlite'] = time_dashboard(app, filters, args.repeats)
+        app.columnar_stores = stores
+
+    backends = list(results)
+    print(f"\nYear-range dashboard ({args.rows:,} rows total, best of {args.repeats}, ms)")
+    print(f"{'Function':<30}" + ''.join(f"{backend:>12}" for backend in backends))
+    for name in DASHBOARD:
+        print(f"{name:<30}" + ''.join(f"{results[backend][name]:>12.1f}" for backend in backends))
+    print(f"{'Total':<30}" + ''.join(f"{sum(results[backend].values()):>12.1f}" for backend in backends))
+
+    if args.keep:
+        print(f"Data kept in {data_dir}")
+    else:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
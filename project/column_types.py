@@ -0,0 +1,104 @@
+# column_types.py
+# Compact storage for reservation columns. By default SQLAlchemy keeps dates
+# and times as ISO text in SQLite; these types store day numbers, minutes of
+# the day and small status codes instead, so rows are smaller and range and
+# overlap checks compare integers. Python code still sees date, time and
+# status names.
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import Integer, SmallInteger
+from sqlalchemy.types import TypeDecorator
+
+EPOCH = date(1970, 1, 1)
+STATUS_CODES = {'confirmed': 1, 'completed': 2, 'cancelled': 3}
+STATUS_NAMES = {code: name for name, code in STATUS_CODES.items()}
+
+
+def day_number(value):
+    # Days since 1970-01-01; accepts dates, datetimes, ISO strings and day numbers
+    if isinstance(value, int):
+        return value
+    if isinstance(value, datetime):
+        value = value.date()
+    elif isinstance(value, str):
+        value = date.fromisoformat(value[:10])
+    return (value - EPOCH).days
+
+
+def minute_of_day(value):
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str):
+        return int(value[:2]) * 60 + int(value[3:5])
+    return value.hour * 60 + value.minute
+
+
+def status_code(value):
+    return STATUS_CODES[value] if isinstance(value, str) else value
+
+
+class DayNumber(TypeDecorator):
+    impl = Integer
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else day_number(value)
+
+    def process_literal_param(self, value, dialect):
+        return day_number(value)
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else EPOCH + timedelta(days=value)
+
+
+class MinuteOfDay(TypeDecorator):
+    impl = Integer
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else minute_of_day(value)
+
+    def process_literal_param(self, value, dialect):
+        return minute_of_day(value)
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else time(value // 60, value % 60)
+
+
+class StatusCode(TypeDecorator):
+    impl = SmallInteger
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else status_code(value)
+
+    def process_literal_param(self, value, dialect):
+        return status_code(value)
+
+    def process_result_value(self, value, dialect):
+        return STATUS_NAMES.get(value, value)
+
+
+# SQL fragments for text queries that read the encoded columns
+def date_sql(expression):
+    return f"date({expression} * 86400, 'unixepoch')"
+
+
+def time_sql(expression):
+    return f"printf('%02d:%02d:00', {expression} / 60, {expression} % 60)"
+
+
+def status_sql(expression):
+    cases = ' '.join(f"WHEN {code} THEN '{name}'" for name, code in STATUS_CODES.items())
+    return f"CASE {expression} {cases} END"
+
+
+# Converting ISO text and status names from databases written before the
+# columns were encoded
+LEGACY_CONVERSIONS = {
+    'date': "CAST(julianday(substr(date, 1, 10)) - 2440587.5 AS INTEGER)",
+    'time': "CAST(substr(time, 1, 2) AS INTEGER) * 60 + CAST(substr(time, 4, 2) AS INTEGER)",
+    'status': "CASE status " + ' '.join(
+        f"WHEN '{name}' THEN {code}" for name, code in STATUS_CODES.items()
+    ) + " END",
+}
@@ -0,0 +1,548 @@
+# columnar.py
+# Optional columnar analytics backend. Each location's booked reservations
+# are kept as monthly Parquet files (sections and statuses dictionary-encoded),
+# refreshed incrementally from the analytics snapshot: a trigger-maintained
+# change log says which months to rewrite. Queries load the files once per refresh,
+# sorted by day, and answer the query_builder queries with numpy over whole
+# columns, so year-range dashboards do not scan SQLite rows. Each month also
+# gets rollups for the two costliest panels: reservations grouped by weekday,
+# time, duration, party size, section and status for the heatmap, and booked
+# and occupied seat-minutes per table, day and service period for utilization.
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, time, timedelta
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from analytics import DEFAULT_DURATION, MINUTES_PER_DAY, SERVICE_PERIODS, table_day_minutes
+from column_types import EPOCH, STATUS_CODES, STATUS_NAMES, day_number
+from query_builder import ALL_SECTIONS, BOOKED_STATUSES
+from sharding import location_slug
+
+COLUMNAR_DIR = 'columnar'
+MANIFEST = 'manifest.json'
+# 'columnar' routes the analytics page to this backend
+ANALYTICS_BACKEND = os.environ.get('ANALYTICS_BACKEND', 'sqlite')
+# Rollup files written next to each month's rows; bump ROLLUP_VERSION when
+# their layout changes so existing stores are rebuilt
+ROLLUPS = ('heatmap', 'utilization')
+ROLLUP_VERSION = 1
+
+# Days touched by every write, recorded by triggers on reservations so a
+# refresh only rereads the months that changed
+CHANGE_LOG_DDL = [
+    # AUTOINCREMENT keeps ids growing after pruning, so the watermark stays valid
+    "CREATE TABLE IF NOT EXISTS reservation_changes (id INTEGER PRIMARY KEY AUTOINCREMENT, date INTEGER NOT NULL)",
+    """CREATE TRIGGER IF NOT EXISTS reservation_changes_insert AFTER INSERT ON reservations
+    BEGIN INSERT INTO reservation_changes (date) VALUES (NEW.date); END""",
+    """CREATE TRIGGER IF NOT EXISTS reservation_changes_update AFTER UPDATE ON reservations
+    BEGIN
+        INSERT INTO reservation_changes (date) VALUES (OLD.date);
+        INSERT INTO reservation_changes (date) VALUES (NEW.date);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS reservation_changes_delete AFTER DELETE ON reservations
+    BEGIN INSERT INTO reservation_changes (date) VALUES (OLD.date); END""",
+]
+CHANGE_LOG_TRIGGERS = ['reservation_changes_insert', 'reservation_changes_update', 'reservation_changes_delete']
+
+DIMENSIONS_QUERY = """
+SELECT t.id, s.name
+FROM tables t
+LEFT JOIN sections s ON t.section_id = s.id
+ORDER BY t.id
+"""
+
+# Booked rows only, matching the partial index on booked reservations
+BOOKED_CODES = ', '.join(str(STATUS_CODES[status]) for status in BOOKED_STATUSES)
+ROWS_QUERY = f"""
+SELECT date, time, COALESCE(duration, :default_duration) AS duration, guest_count, table_id, status
+FROM reservations
+WHERE date BETWEEN :first_day AND :last_day AND status IN ({BOOKED_CODES})
+ORDER BY date
+"""
+
+PARTY_SIZES = [(1, 2, '1-2 guests'), (3, 4, '3-4 guests'), (5, 6, '5-6 guests')]
+LARGE_PARTY = '7+ guests'
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("The columnar analytics backend requires the pyarrow package.")
+    return pa, pq
+
+
+def month_key(day):
+    value = EPOCH + timedelta(days=int(day))
+    return f"{value.year:04d}-{value.month:02d}"
+
+
+def month_bounds(key):
+    year, month = (int(part) for part in key.split('-'))
+    first = datetime(year, month, 1).date()
+    last = (datetime(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)).date()
+    return day_number(first), day_number(last)
+
+
+def rollup_signature():
+    # Utilization rollups depend on the service periods
+    return f"{ROLLUP_VERSION}:{json.dumps(SERVICE_PERIODS, sort_keys=True)}"
+
+
+def months_between(first_day, last_day):
+    # Keys of the months overlapping the day range, in order
+    keys = []
+    day = first_day
+    while day <= last_day:
+        keys.append(month_key(day))
+        day = month_bounds(keys[-1])[1] + 1
+    return keys
+
+
+def whole_months(first_day, last_day):
+    # (first, last) day of the whole calendar months inside the day range,
+    # or None if it spans no whole month
+    month_first, month_last = month_bounds(month_key(first_day))
+    first = first_day if first_day == month_first else month_last + 1
+    month_first, month_last = month_bounds(month_key(last_day))
+    last = last_day if last_day == month_last else month_first - 1
+    return (first, last) if first <= last else None
+
+
+def install_change_log(connection):
+    for statement in CHANGE_LOG_DDL:
+        connection.execute(text(statement))
+
+
+def remove_change_log(connection):
+    # Without the backend nothing would ever prune the log
+    for trigger in CHANGE_LOG_TRIGGERS:
+        connection.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+    connection.execute(text("DROP TABLE IF EXISTS reservation_changes"))
+
+
+class ColumnarStore:
+    """Monthly Parquet partitions of one location's reservations."""
+
+    def __init__(self, snapshot, source_engine, store_dir):
+        self.snapshot = snapshot
+        # Live database, only used to prune the change log
+        self.source_engine = source_engine
+        self.store_dir = store_dir
+        self._refresh_lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._loaded_version = None
+        self._columns = None
+
+    def _manifest_path(self):
+        return os.path.join(self.store_dir, MANIFEST)
+
+    def manifest(self):
+        try:
+            with open(self._manifest_path()) as manifest_file:
+                return json.load(manifest_file)
+        except FileNotFoundError:
+            return {'version': 0, 'dimensions': None, 'change_id': None, 'months': [], 'source_taken_at': None,
+                    'rollups': None}
+
+    @property
+    def taken_at(self):
+        taken_at = self.manifest()['source_taken_at']
+        return datetime.fromisoformat(taken_at) if taken_at else None
+
+    def covers(self, filters):
+        # Only booked reservations are stored
+        return filters.statuses is not None and set(filters.statuses) <= set(BOOKED_STATUSES)
+
+    def refresh(self):
+        # Rewrite the months changed since the last refresh (every month on
+        # the first build); returns the number of months written
+        pa, pq = _require_pyarrow()
+        if not self._refresh_lock.acquire(blocking=self.taken_at is None):
+            # Another thread is already refreshing; keep serving the current files
+            return 0
+        try:
+            taken_at = self.snapshot.ensure_fresh()
+            with self.snapshot.engine().connect() as connection:
+                has_log = connection.execute(text(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'reservation_changes'"
+                )).first() is not None
+            if not has_log:
+                # Snapshot taken before the change log was installed
+                taken_at = self.snapshot.refresh()
+            os.makedirs(self.store_dir, exist_ok=True)
+            manifest = self.manifest()
+            with self.snapshot.engine().connect() as connection:
+                dimensions = connection.execute(text(DIMENSIONS_QUERY)).fetchall()
+                sections = {table_id: section for table_id, section in dimensions}
+                dimensions_hash = hashlib.sha1(repr(dimensions).encode()).hexdigest()
+                change_id = connection.execute(text("SELECT MAX(id) FROM reservation_changes")).scalar() or 0
+
+                rebuild = (dimensions_hash != manifest['dimensions'] or manifest['change_id'] is None
+                           or manifest.get('rollups') != rollup_signature())
+                if rebuild:
+                    # First build, tables moved between sections or rollups
+                    # changed: every month
+                    first_day, last_day = connection.execute(text(
+                        f"SELECT MIN(date), MAX(date) FROM reservations WHERE status IN ({BOOKED_CODES})"
+                    )).fetchone()
+                    stale = set(manifest['months'])
+                    if first_day is not None:
+                        stale.update(months_between(first_day, last_day))
+                else:
+                    changed_days = connection.execute(
+                        text("SELECT DISTINCT date FROM reservation_changes WHERE id > :change_id"),
+                        {'change_id': manifest['change_id']},
+                    ).fetchall()
+                    stale = {month_key(row[0]) for row in changed_days}
+
+                # One month in memory at a time, however long the history
+                months = set(manifest['months'])
+                written = 0
+                for key in sorted(stale):
+                    path = os.path.join(self.store_dir, f"{key}.parquet")
+                    rows = self._read_month(connection, key)
+                    if not rows.empty:
+                        self._write_month(pa, pq, path, rows, sections)
+                        self._write_rollups(pa, pq, key, rows, sections)
+                        months.add(key)
+                        written += 1
+                    elif key in months:
+                        # No booked reservations left in the month
+                        for stale_path in [path] + [self._rollup_path(key, rollup) for rollup in ROLLUPS]:
+                            if os.path.exists(stale_path):
+                                os.remove(stale_path)
+                        months.discard(key)
+
+            if stale or rebuild:
+                manifest['version'] += 1
+            manifest['months'] = sorted(months)
+            manifest['dimensions'] = dimensions_hash
+            manifest['rollups'] = rollup_signature()
+            manifest['change_id'] = change_id
+            manifest['source_taken_at'] = taken_at.isoformat() if taken_at else None
+            tmp_path = self._manifest_path() + '.tmp'
+            with open(tmp_path, 'w') as manifest_file:
+                json.dump(manifest, manifest_file)
+            os.replace(tmp_path, self._manifest_path())
+
+            # Entries up to the watermark are reflected in the files
+            with self.source_engine.begin() as connection:
+                connection.execute(text("DELETE FROM reservation_changes WHERE id <= :change_id"),
+                                   {'change_id': change_id})
+            return written
+        finally:
+            self._refresh_lock.release()
+
+    def _read_month(self, connection, key):
+        # Booked rows of one month, sorted by day
+        first_day, last_day = month_bounds(key)
+        return pd.read_sql_query(text(ROWS_QUERY), connection, params={
+            'default_duration': DEFAULT_DURATION, 'first_day': first_day, 'last_day': last_day,
+        })
+
+    def ensure_built(self):
+        # The first build runs inline; later refreshes run in the background
+        if self.taken_at is None:
+            self.refresh()
+        return self.taken_at
+
+    def _write_month(self, pa, pq, path, rows, sections):
+        table = pa.table({
+            'date': pa.array(rows['date'].to_numpy(), pa.int32()),
+            'time': pa.array(rows['time'].to_numpy(), pa.int16()),
+            'duration': pa.array(rows['duration'].to_numpy(), pa.int16()),
+            'guest_count': pa.array(rows['guest_count'].to_numpy(), pa.int16()),
+            'table_id': pa.array(rows['table_id'].fillna(-1).to_numpy(), pa.int32()),
+            # Low-cardinality strings stored once per file and referenced by index
+            'section': pa.array(rows['table_id'].map(sections), pa.string()).dictionary_encode(),
+            'status': pa.array(rows['status'].map(STATUS_NAMES), pa.string()).dictionary_encode(),
+        })
+        pq.write_table(table, path + '.tmp')
+        os.replace(path + '.tmp', path)
+
+    def _rollup_path(self, key, rollup):
+        return os.path.join(self.store_dir, f"{key}.{rollup}.parquet")
+
+    def _write_rollups(self, pa, pq, key, rows, sections):
+        first_day, last_day = month_bounds(key)
+        dates = rows['date'].to_numpy()
+        table_ids = rows['table_id'].fillna(-1).to_numpy().astype(np.int64)
+        section_of = pd.Series(table_ids).map(sections)
+
+        # Each weekday of the month is represented by its first date, so the
+        # groups are (date, time, duration) rows like reservations, with a count
+        heatmap = pd.DataFrame({
+            'date': first_day + (dates - first_day) % 7,
+            'time': rows['time'].to_numpy(),
+            'duration': rows['duration'].to_numpy(),
+            'guest_count': rows['guest_count'].to_numpy(),
+            'section': section_of.fillna('').to_numpy(),
+            'status': rows['status'].to_numpy(),
+        }).groupby(['date', 'time', 'duration', 'guest_count', 'section', 'status']).size().reset_index(name='count')
+        self._write_rollup(pa, pq, key, 'heatmap', {
+            'date': pa.array(heatmap['date'].to_numpy(), pa.int32()),
+            'time': pa.array(heatmap['time'].to_numpy(), pa.int16()),
+            'duration': pa.array(heatmap['duration'].to_numpy(), pa.int16()),
+            'guest_count': pa.array(heatmap['guest_count'].to_numpy(), pa.int16()),
+            # '' stands for no section, which a section filter never matches
+            'section': pa.array(heatmap['section'], pa.string()).dictionary_encode(),
+            'status': pa.array(heatmap['status'].map(STATUS_NAMES), pa.string()).dictionary_encode(),
+            'count': pa.array(heatmap['count'].to_numpy(), pa.int32()),
+        })
+
+        # Seat-minutes per table, day and period over every booked reservation
+        table_codes, tables = pd.factorize(table_ids)
+        starts = rows['time'].to_numpy().astype(np.int64)
+        minutes = table_day_minutes(
+            table_codes, dates - first_day, starts, starts + rows['duration'].to_numpy(),
+            rows['guest_count'].to_numpy().astype(float), len(tables), last_day - first_day + 1,
+        )
+        frames = []
+        for period, (booked, occupied) in minutes.items():
+            table_index, day_index = np.nonzero((booked > 0) | (occupied > 0))
+            frames.append(pd.DataFrame({
+                'date': first_day + day_index,
+                'table_id': tables[table_index],
+                'period': period,
+                'booked_seat_minutes': booked[table_index, day_index],
+                'occupied_minutes': occupied[table_index, day_index],
+            }))
+        utilization = pd.concat(frames, ignore_index=True).sort_values('date', kind='stable')
+        self._write_rollup(pa, pq, key, 'utilization', {
+            'date': pa.array(utilization['date'].to_numpy(), pa.int32()),
+            'table_id': pa.array(utilization['table_id'].to_numpy(), pa.int32()),
+            'section': pa.array(utilization['table_id'].map(sections).fillna(''), pa.string()).dictionary_encode(),
+            'period': pa.array(utilization['period'], pa.string()).dictionary_encode(),
+            'booked_seat_minutes': pa.array(utilization['booked_seat_minutes'].to_numpy(), pa.float64()),
+            'occupied_minutes': pa.array(utilization['occupied_minutes'].to_numpy(), pa.float64()),
+        })
+
+    def _write_rollup(self, pa, pq, key, rollup, columns):
+        path = self._rollup_path(key, rollup)
+        pq.write_table(pa.table(columns), path + '.tmp')
+        os.replace(path + '.tmp', path)
+
+    def _load_rollup(self, pa, pq, months, rollup):
+        tables = [pq.read_table(self._rollup_path(key, rollup)) for key in months]
+        if not tables:
+            return None
+        frame = pa.concat_tables(tables).unify_dictionaries().to_pandas()
+        for name in ('section', 'status', 'period'):
+            if name in frame:
+                frame[name] = frame[name].astype(str)
+        return frame
+
+    def columns(self):
+        # Whole-history columns, reloaded only when the manifest version changes
+        manifest = self.manifest()
+        if self._columns is not None and self._loaded_version == manifest['version']:
+            return self._columns
+        pa, pq = _require_pyarrow()
+        with self._load_lock:
+            if self._columns is not None and self._loaded_version == manifest['version']:
+                return self._columns
+            paths = [os.path.join(self.store_dir, f"{key}.parquet") for key in manifest['months']]
+            if paths:
+                table = pa.concat_tables([pq.read_table(path) for path in paths]).unify_dictionaries()
+                frame = table.to_pandas()
+            else:
+                frame = pd.DataFrame({
+                    'date': pd.Series(dtype='int32'), 'time': pd.Series(dtype='int16'),
+                    'duration': pd.Series(dtype='int16'), 'guest_count': pd.Series(dtype='int16'),
+                    'table_id': pd.Series(dtype='int32'),
+                    'section': pd.Categorical([]), 'status': pd.Categorical([]),
+                })
+            # Months are written in order and sorted by day, so a date range is a slice
+            self._columns = {
+                'date': frame['date'].to_numpy(),
+                'time': frame['time'].to_numpy(),
+                'duration': frame['duration'].to_numpy(),
+                'guest_count': frame['guest_count'].to_numpy(),
+                'table_id': frame['table_id'].to_numpy(),
+                # Category code -1 (no section) becomes 0
+                'section': frame['section'].cat.codes.to_numpy() + 1,
+                'section_names': [None] + list(frame['section'].cat.categories),
+                'status': frame['status'].cat.codes.to_numpy(),
+                'status_names': list(frame['status'].cat.categories),
+                'guest_range': (int(frame['guest_count'].min()), int(frame['guest_count'].max())) if len(frame) else None,
+                # Rollups are small enough to filter as frames; a store built
+                # before them answers from rows until its next refresh
+                'rollups': {
+                    rollup: self._load_rollup(pa, pq, manifest['months'], rollup)
+                    if manifest.get('rollups') == rollup_signature() else None
+                    for rollup in ROLLUPS
+                },
+            }
+            self._loaded_version = manifest['version']
+        return self._columns
+
+    def _select(self, filters, first_day=None, last_day=None):
+        # (columns, date slice, row mask within the slice) for the filters,
+        # optionally narrowed to a day range. Criteria every stored row meets
+        # are skipped, so the mask is often just the whole slice.
+        columns = self.columns()
+        first_day = day_number(filters.start_date) if first_day is None else first_day
+        last_day = day_number(filters.end_date) if last_day is None else last_day
+        # Searching with the column's own type; a Python int would make
+        # numpy convert the whole column on every call
+        day_type = columns['date'].dtype.type
+        start = np.searchsorted(columns['date'], day_type(first_day), side='left')
+        stop = np.searchsorted(columns['date'], day_type(last_day), side='right')
+        window = slice(start, stop)
+        mask = None
+        if filters.section not in (None, ALL_SECTIONS):
+            names = columns['section_names']
+            code = names.index(filters.section) if filters.section in names else -1
+            mask = columns['section'][window] == code
+        guest_range = columns['guest_range']
+        if (filters.min_guests is not None and filters.max_guests is not None and guest_range is not None
+                and not filters.min_guests <= guest_range[0] <= guest_range[1] <= filters.max_guests):
+            guests = columns['guest_count'][window]
+            matches = (guests >= filters.min_guests) & (guests <= filters.max_guests)
+            mask = matches if mask is None else mask & matches
+        if filters.statuses is not None and not set(columns['status_names']) <= set(filters.statuses):
+            # Lookup by category code instead of np.isin
+            allowed = np.array([name in filters.statuses for name in columns['status_names']] + [False])
+            matches = allowed[columns['status'][window]]
+            mask = matches if mask is None else mask & matches
+        return columns, window, slice(None) if mask is None else mask
+
+    def run(self, name, filters, **extra_params):
+        # Same rows as query_builder.run(...).fetchall() for the named query
+        columns, window, mask = self._select(filters)
+
+        def column(key):
+            return columns[key][window][mask]
+
+        if name == 'totals':
+            guests = column('guest_count')
+            return [(len(guests), int(guests.sum()) if len(guests) else None)]
+        if name in ('by_date', 'daily'):
+            # Rows are sorted by day, so counting from the first needs no sort
+            days = column('date')
+            if not len(days):
+                return []
+            counts = np.bincount(days - days[0])
+            return [(EPOCH + timedelta(days=int(days[0]) + int(offset)), int(counts[offset]))
+                    for offset in np.flatnonzero(counts)]
+        if name == 'by_time':
+            counts = np.bincount(column('time'), minlength=MINUTES_PER_DAY)
+            return [(time(minute // 60, minute % 60), int(counts[minute])) for minute in np.flatnonzero(counts)]
+        if name in ('by_section', 'section_reservations'):
+            counts = np.bincount(column('section'), minlength=len(columns['section_names']))
+            # Name order, as SQLite's GROUP BY returns them: reservations
+            # without a table (no section) come first
+            return sorted(
+                ((columns['section_names'][code], int(counts[code])) for code in np.flatnonzero(counts)),
+                key=lambda row: (row[0] is not None, row[0]),
+            )
+        if name == 'party_size':
+            guests = column('guest_count')
+            labels = [label for _, _, label in PARTY_SIZES] + [LARGE_PARTY]
+            # Party size label code per guest count, looked up in one pass
+            codes = np.full(max(int(guests.max()) if len(guests) else 0, PARTY_SIZES[-1][1]) + 1, len(PARTY_SIZES))
+            for code, (low, high, _) in enumerate(PARTY_SIZES):
+                codes[low:high + 1] = code
+            counts = np.bincount(codes[guests], minlength=len(labels))
+            return [(labels[code], int(counts[code])) for code in np.flatnonzero(counts)]
+        if name == 'reservation_rows':
+            # A frame rather than tuples; callers wrap it in a DataFrame either way
+            return pd.DataFrame({
+                'table_id': column('table_id'),
+                'date': column('date'),
+                'time': column('time'),
+                'duration': column('duration'),
+                'guest_count': column('guest_count'),
+            })
+        raise KeyError(name)
+
+    def _rollup_mask(self, frame, filters, first_day, last_day):
+        dates = frame['date'].to_numpy()
+        mask = (dates >= first_day) & (dates <= last_day)
+        if filters.section not in (None, ALL_SECTIONS):
+            mask &= frame['section'].to_numpy() == filters.section
+        if filters.min_guests is not None and filters.max_guests is not None and 'guest_count' in frame:
+            guests = frame['guest_count'].to_numpy()
+            mask &= (guests >= filters.min_guests) & (guests <= filters.max_guests)
+        # Rollups hold the same statuses as the rows; skip a filter keeping all of them
+        if (filters.statuses is not None and 'status' in frame
+                and not set(self.columns()['status_names']) <= set(filters.statuses)):
+            mask &= np.isin(frame['status'].to_numpy(), list(filters.statuses))
+        return mask
+
+    def heatmap_rows(self, filters):
+        # (date, time, duration, count) rows for occupancy_heatmap: whole
+        # months in the range come from the heatmap rollup, the partial months
+        # at either end from the rows
+        start, end = day_number(filters.start_date), day_number(filters.end_date)
+        months = whole_months(start, end)
+        columns = self.columns()
+        rollup = columns['rollups']['heatmap']
+        edges = [(start, end)] if months is None or rollup is None else [(start, months[0] - 1), (months[1] + 1, end)]
+        frames = []
+        for first_day, last_day in edges:
+            if first_day > last_day:
+                continue
+            _, window, mask = self._select(filters, first_day, last_day)
+            frames.append(pd.DataFrame({
+                key: columns[key][window][mask] for key in ('date', 'time', 'duration')
+            }).assign(count=1))
+        if months is not None and rollup is not None:
+            frames.append(rollup.loc[self._rollup_mask(rollup, filters, *months), ['date', 'time', 'duration', 'count']])
+        if not frames:
+            return pd.DataFrame(columns=['date', 'time', 'duration', 'count']).astype('int64')
+        return pd.concat(frames, ignore_index=True).astype('int64')
+
+    def utilization_rollup(self, filters):
+        # (table_id, period, booked_seat_minutes, occupied_minutes) per day in
+        # the range, or None when utilization needs the rows: a party size or
+        # status filter excludes rows the rollup counted, or there is no rollup
+        columns = self.columns()
+        rollup = columns['rollups']['utilization']
+        if rollup is None or set(filters.statuses or ()) != set(BOOKED_STATUSES):
+            return None
+        guest_range = columns['guest_range']
+        if (filters.min_guests is not None and filters.max_guests is not None and guest_range is not None
+                and not filters.min_guests <= guest_range[0] <= guest_range[1] <= filters.max_guests):
+            return None
+        mask = self._rollup_mask(rollup, filters, day_number(filters.start_date), day_number(filters.end_date))
+        return rollup.loc[mask, ['table_id', 'period', 'booked_seat_minutes', 'occupied_minutes']]
+
+
+class ColumnarStoreManager:
+    """One columnar store per location, built from its analytics snapshot."""
+
+    def __init__(self, router, snapshots):
+        self.router = router
+        self.snapshots = snapshots
+        self._stores = {}
+        self._lock = threading.Lock()
+
+    def get(self, location=None):
+        location = location or self.router.default_location
+        with self._lock:
+            store = self._stores.get(location)
+            if store is None:
+                store_dir = os.path.join(self.router.data_dir, COLUMNAR_DIR, location_slug(location))
+                store = ColumnarStore(self.snapshots.get(location), self.router.engine(location), store_dir)
+                self._stores[location] = store
+        return store
+
+    def ensure_built(self, location=None):
+        for loc in self.router.resolve(location):
+            self.get(loc).ensure_built()
+
+    def data_as_of(self, location=None):
+        timestamps = [self.get(loc).taken_at for loc in self.router.resolve(location)]
+        timestamps = [taken_at for taken_at in timestamps if taken_at is not None]
+        return min(timestamps) if timestamps else None
+
+    def refresh(self, location=None):
+        return sum(self.get(loc).refresh() for loc in self.router.resolve(location))
@@ -0,0 +1,160 @@
+# exports.py
+# Streaming report exports. Rows are pulled from the database cursor in
+# fixed-size chunks and written straight to the output file, so memory use
+# stays flat no matter how many rows are exported.
+import csv
+import functools
+import os
+import time
+from datetime import datetime
+
+from sqlalchemy import text
+
+CHUNK_SIZE = 5000
+EXPORT_DIR = 'exports'
+# Exported files older than this are deleted by the maintenance job
+EXPORT_MAX_AGE = int(os.environ.get('EXPORT_MAX_AGE', 24 * 60 * 60))
+EXPORT_FORMATS = {
+    'CSV': 'csv',
+    'Excel': 'xlsx',
+    'Parquet': 'parquet',
+}
+MIME_TYPES = {
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+
+def stream_query(engine, query, params=None, chunk_size=CHUNK_SIZE):
+    # Yield (columns, rows) chunks without materializing the full result
+    with engine.connect() as connection:
+        result = connection.execution_options(stream_results=True, yield_per=chunk_size).execute(
+            text(query), params or {}
+        )
+        columns = list(result.keys())
+        empty = True
+        for rows in result.partitions(chunk_size):
+            empty = False
+            yield columns, rows
+        if empty:
+            # Still produce a header for empty reports
+            yield columns, []
+
+
+def stream_shards(sources, query, params=None, chunk_size=CHUNK_SIZE):
+    # Chain the chunks of several (location, engine) sources; with more than
+    # one source every row is tagged with its location
+    tag = len(sources) > 1
+    for location, engine in sources:
+        for columns, rows in stream_query(engine, query, params, chunk_size):
+            if tag:
+                yield ['location'] + columns, [(location,) + tuple(row) for row in rows]
+            else:
+                yield columns, rows
+
+
+def write_csv(chunks, path):
+    count = 0
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        header_written = False
+        for columns, rows in chunks:
+            if not header_written:
+                writer.writerow(columns)
+                header_written = True
+            writer.writerows(rows)
+            count += len(rows)
+    return count
+
+
+def write_excel(chunks, path):
+    try:
+        from openpyxl import Workbook
+    except ImportError:
+        raise RuntimeError("Excel export requires the openpyxl package.")
+
+    # Write-only workbooks stream rows to disk instead of keeping cells in memory
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Report')
+    count = 0
+    header_written = False
+    for columns, rows in chunks:
+        if not header_written:
+            sheet.append(columns)
+            header_written = True
+        for row in rows:
+            sheet.append(list(row))
+        count += len(rows)
+    workbook.save(path)
+    return count
+
+
+def write_parquet(chunks, path, column_types=None):
+    # column_types maps column names to pyarrow type names ('int64',
+    # 'string', ...); undeclared columns, such as the location tag, are strings
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export requires the pyarrow package.")
+
+    # Each chunk becomes its own row group
+    column_types = column_types or {}
+    writer = None
+    count = 0
+    try:
+        for columns, rows in chunks:
+            if writer is None:
+                # Declared up front: types inferred from the first chunk break
+                # when it is empty or a LEFT JOIN column in it is all NULL
+                schema = pa.schema([(column, getattr(pa, column_types.get(column, 'string'))()) for column in columns])
+                writer = pq.ParquetWriter(path, schema)
+            data = {column: [row[i] for row in rows] for i, column in enumerate(columns)}
+            writer.write_table(pa.table(data, schema=writer.schema))
+            count += len(rows)
+    finally:
+        if writer is not None:
+            writer.close()
+    return count
+
+
+WRITERS = {
+    'csv': write_csv,
+    'xlsx': write_excel,
+    'parquet': write_parquet,
+}
+
+
+def export_report(sources, query, params, extension, export_dir, name, column_types=None):
+    # Stream a report into data/exports and return (path, row count)
+    os.makedirs(export_dir, exist_ok=True)
+    path = os.path.join(export_dir, f"{name}_{datetime.now():%Y%m%d_%H%M%S}.{extension}")
+    writer = WRITERS[extension]
+    if extension == 'parquet':
+        writer = functools.partial(write_parquet, column_types=column_types)
+    count = writer(stream_shards(sources, query, params), path)
+    return path, count
+
+
+def read_export(path):
+    # Deferred download contents: the file is read when the button is
+    # clicked, not on every rerun that shows the button
+    def read():
+        with open(path, 'rb') as f:
+            return f.read()
+    return read
+
+
+def prune_exports(export_dir, max_age=EXPORT_MAX_AGE):
+    # Delete exports older than max_age seconds; returns how many
+    if not os.path.isdir(export_dir):
+        return 0
+    cutoff = time.time() - max_age
+    removed = 0
+    for name in os.listdir(export_dir):
+        path = os.path.join(export_dir, name)
+        if os.path.isfile(path) and os.path.getmtime(path) < cutoff:
+            os.remove(path)
+            removed += 1
+    return removed
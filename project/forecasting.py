@@ -0,0 +1,241 @@
+# forecasting.py
+# Demand forecasts per location. A weekday x hour model of booking,
+# cancellation and guest rates is fitted with whole-column numpy passes over
+# past reservations, weighting recent weeks more. Retraining is incremental:
+# the model keeps decayed running totals and folds in only the days that
+# have ended since the last fit, so a daily retrain reads one day of rows.
+# Retraining runs off the request path: on the nightly job, or on a
+# background thread when an outlook finds the model behind.
+# Forecasts give managers a capacity outlook and tell the maintenance jobs
+# which upcoming dates to pre-warm before hosts start checking them.
+import json
+import os
+import threading
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from analytics import DEFAULT_DURATION, WEEKDAYS, weekdays_of
+from column_types import EPOCH, STATUS_CODES, day_number
+from sharding import location_slug
+
+FORECAST_DIR = 'forecasts'
+HOURS = 24
+# A day's weight halves every HALF_LIFE_DAYS, so the model follows trends
+HALF_LIFE_DAYS = 56
+DECAY = 0.5 ** (1 / HALF_LIFE_DAYS)
+# History read by the first fit; older days would carry almost no weight
+INITIAL_HISTORY_DAYS = 365
+FORECAST_DAYS = 14
+
+HISTORY_QUERY = """
+SELECT date, time, guest_count, status FROM reservations
+WHERE date BETWEEN :first_day AND :last_day AND status IS NOT NULL
+"""
+ON_BOOKS_QUERY = f"""
+SELECT date, COUNT(*) FROM reservations
+WHERE date BETWEEN :first_day AND :last_day AND status = {STATUS_CODES['confirmed']}
+GROUP BY date
+"""
+SEATS_QUERY = "SELECT COALESCE(SUM(capacity), 0) FROM tables"
+
+OUTLOOK_COLUMNS = [
+    'Date', 'Weekday', 'On Books', 'Forecast Bookings', 'Forecast Guests',
+    'Cancellation %', 'Peak Hour', 'Peak Seat Use %',
+]
+
+
+class DemandModel:
+    """Decayed weekday x hour totals; forecasts are ratios of them."""
+
+    def __init__(self, state=None):
+        state = state or {}
+        # Last day folded in, as a day number
+        self.trained_through = state.get('trained_through')
+        # Weighted count of each weekday seen, and per weekday and arrival
+        # hour the weighted bookings kept, bookings cancelled and guests
+        self.days = np.array(state.get('days', np.zeros(7)), dtype=float)
+        self.booked = np.array(state.get('booked', np.zeros((7, HOURS))), dtype=float)
+        self.cancelled = np.array(state.get('cancelled', np.zeros((7, HOURS))), dtype=float)
+        self.guests = np.array(state.get('guests', np.zeros((7, HOURS))), dtype=float)
+
+    def state(self):
+        return {
+            'trained_through': self.trained_through,
+            'days': self.days.tolist(),
+            'booked': self.booked.tolist(),
+            'cancelled': self.cancelled.tolist(),
+            'guests': self.guests.tolist(),
+        }
+
+    def fold(self, first_day, last_day, rows):
+        # Add days first_day..last_day with their reservations (day numbers,
+        # minutes, guest counts, status codes); each day is weighted by
+        # DECAY ** (days between it and last_day)
+        if self.trained_through is not None:
+            aged = DECAY ** (last_day - self.trained_through)
+            for totals in (self.days, self.booked, self.cancelled, self.guests):
+                totals *= aged
+        calendar = np.arange(first_day, last_day + 1)
+        self.days += np.bincount(weekdays_of(calendar), weights=DECAY ** (last_day - calendar), minlength=7)
+
+        dates = rows['date'].to_numpy(dtype=np.int64)
+        weights = DECAY ** (last_day - dates)
+        cells = weekdays_of(dates) * HOURS + rows['time'].to_numpy(dtype=np.int64) // 60
+        cancelled = rows['status'].to_numpy(dtype=np.int64) == STATUS_CODES['cancelled']
+        kept = ~cancelled
+        guests = rows['guest_count'].to_numpy(dtype=np.int64)
+        self.booked += np.bincount(cells[kept], weights=weights[kept], minlength=7 * HOURS).reshape(7, HOURS)
+        self.cancelled += np.bincount(cells[cancelled], weights=weights[cancelled], minlength=7 * HOURS).reshape(7, HOURS)
+        self.guests += np.bincount(cells[kept], weights=(weights * guests)[kept], minlength=7 * HOURS).reshape(7, HOURS)
+        self.trained_through = last_day
+
+    def hourly(self, days):
+        # (bookings kept, cancellations, guests) expected per arrival hour on
+        # each day number, each shaped (len(days), 24)
+        weekdays = weekdays_of(np.asarray(days))
+        seen = self.days[weekdays][:, None]
+        return tuple(
+            np.divide(totals[weekdays], seen, out=np.zeros((len(weekdays), HOURS)), where=seen > 0)
+            for totals in (self.booked, self.cancelled, self.guests)
+        )
+
+
+class DemandForecaster:
+    """One location's demand model, persisted between restarts."""
+
+    def __init__(self, snapshot, state_path):
+        self.snapshot = snapshot
+        self.state_path = state_path
+        self._lock = threading.Lock()
+        self._model = None
+        self._retraining = None
+
+    def model(self):
+        if self._model is None:
+            try:
+                with open(self.state_path) as state_file:
+                    self._model = DemandModel(json.load(state_file))
+            except FileNotFoundError:
+                self._model = DemandModel()
+        return self._model
+
+    def retrain(self, today=None):
+        # Fold in the days that ended since the last fit; returns how many
+        last_day = day_number(today or date.today()) - 1
+        with self._lock:
+            model = self.model()
+            if model.trained_through is not None and model.trained_through >= last_day:
+                return 0
+            self.snapshot.ensure_fresh()
+            with self.snapshot.engine().connect() as connection:
+                if model.trained_through is not None:
+                    first_day = model.trained_through + 1
+                else:
+                    # First fit: from the oldest reservation, at most a year back
+                    oldest = connection.execute(text("SELECT MIN(date) FROM reservations")).scalar()
+                    if oldest is None:
+                        return 0
+                    first_day = max(oldest, last_day - INITIAL_HISTORY_DAYS + 1)
+                if first_day > last_day:
+                    return 0
+                rows = pd.read_sql_query(
+                    text(HISTORY_QUERY), connection, params={'first_day': first_day, 'last_day': last_day},
+                )
+            model.fold(first_day, last_day, rows)
+
+            os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+            tmp_path = self.state_path + '.tmp'
+            with open(tmp_path, 'w') as state_file:
+                json.dump(model.state(), state_file)
+            os.replace(tmp_path, self.state_path)
+            return last_day - first_day + 1
+
+    def retrain_in_background(self, today=None):
+        # Start a retrain unless one is already running; the caller keeps
+        # the current model meanwhile
+        with self._lock:
+            if self._retraining is not None and self._retraining.is_alive():
+                return
+            self._retraining = threading.Thread(
+                target=self.retrain, args=(today,), name='forecast-retrain', daemon=True,
+            )
+            self._retraining.start()
+
+    def outlook(self, days=FORECAST_DAYS, today=None):
+        # One row per upcoming day: reservations already confirmed, the
+        # forecast, and the peak share of seats expected to be in use. Uses
+        # the model as last fitted; a model that is behind (first start, or a
+        # missed nightly retrain) is brought up to date in the background.
+        today = today or date.today()
+        trained_through = self.model().trained_through
+        if trained_through is None or trained_through < day_number(today) - 1:
+            self.retrain_in_background(today)
+        first_day = day_number(today)
+        calendar = np.arange(first_day, first_day + days)
+        self.snapshot.ensure_fresh()
+        with self.snapshot.engine().connect() as connection:
+            on_books = dict(connection.execute(
+                text(ON_BOOKS_QUERY), {'first_day': first_day, 'last_day': first_day + days - 1},
+            ).fetchall())
+            seats = connection.execute(text(SEATS_QUERY)).scalar()
+
+        bookings, cancellations, guests = self.model().hourly(calendar)
+        # Guests arriving in an hour stay for the default duration
+        stay = max(DEFAULT_DURATION // 60, 1)
+        padded = np.pad(guests, ((0, 0), (stay - 1, 0)))
+        in_house = sum(padded[:, offset:offset + HOURS] for offset in range(stay))
+        booked_now = np.array([on_books.get(int(day), 0) for day in calendar])
+        expected = bookings.sum(axis=1)
+        # Cancellations stand in for no-shows, which are not recorded
+        requested = expected + cancellations.sum(axis=1)
+        return pd.DataFrame({
+            'Date': [EPOCH + timedelta(days=int(day)) for day in calendar],
+            'Weekday': [WEEKDAYS[weekday] for weekday in weekdays_of(calendar)],
+            'On Books': booked_now,
+            # Never fewer than are already confirmed
+            'Forecast Bookings': np.maximum(expected, booked_now).round(1),
+            'Forecast Guests': guests.sum(axis=1).round(1),
+            'Cancellation %': (np.divide(requested - expected, requested, out=np.zeros(days), where=requested > 0) * 100).round(1),
+            'Peak Hour': [f"{hour:02d}:00" if peak else '' for hour, peak in zip(in_house.argmax(axis=1), in_house.max(axis=1))],
+            'Peak Seat Use %': (in_house.max(axis=1) / seats * 100 if seats else np.zeros(days)).round(1),
+        }, columns=OUTLOOK_COLUMNS)
+
+    def busiest_days(self, limit, days=FORECAST_DAYS, today=None):
+        # Upcoming dates with the most expected bookings, busiest first
+        outlook = self.outlook(days, today)
+        return list(outlook.nlargest(limit, 'Forecast Bookings')['Date'])
+
+
+class ForecastManager:
+    """One demand forecaster per location, fitted on its analytics snapshot."""
+
+    def __init__(self, router, snapshots):
+        self.router = router
+        self.snapshots = snapshots
+        self._forecasters = {}
+        self._lock = threading.Lock()
+
+    def get(self, location=None):
+        location = location or self.router.default_location
+        with self._lock:
+            forecaster = self._forecasters.get(location)
+            if forecaster is None:
+                state_path = os.path.join(self.router.data_dir, FORECAST_DIR, f"{location_slug(location)}.json")
+                forecaster = DemandForecaster(self.snapshots.get(location), state_path)
+                self._forecasters[location] = forecaster
+        return forecaster
+
+    def outlook(self, location=None, days=FORECAST_DAYS):
+        # Several locations get a Location column
+        locations = self.router.resolve(location)
+        if len(locations) == 1:
+            return self.get(locations[0]).outlook(days)
+        return pd.concat(
+            [self.get(loc).outlook(days).assign(Location=loc) for loc in locations], ignore_index=True,
+        )[['Location'] + OUTLOOK_COLUMNS]
+
+    def retrain(self, location=None):
+        return sum(self.get(loc).retrain() for loc in self.router.resolve(location))
@@ -0,0 +1,272 @@
+# inventory.py
+# Precomputed slot inventory: one row per (date, slot, table) for a rolling
+# horizon. Bookings, edits and cancellations flip cells in the same
+# transaction as the reservation row, so availability is a single indexed
+# lookup and two hosts can never claim the same cell. Hosts on the
+# table-selection step place short-lived holds on the cells they picked.
+import os
+import time as time_module
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import (
+    Column, Float, Index, Integer, MetaData, String, Table, and_, bindparam, column, func, or_, select, table, text,
+)
+
+from analytics import DEFAULT_DURATION, MINUTES_PER_DAY, minutes_of_day
+from column_types import STATUS_CODES, DayNumber, day_number
+
+SLOT_MINUTES = 30
+SLOTS_PER_DAY = MINUTES_PER_DAY // SLOT_MINUTES
+HORIZON_DAYS = int(os.environ.get('INVENTORY_HORIZON_DAYS', 90))
+# How long a table picked on the selection step stays reserved for that host
+HOLD_SECONDS = 5 * 60
+
+metadata = MetaData()
+
+slot_inventory = Table(
+    'slot_inventory', metadata,
+    Column('date', DayNumber, primary_key=True),
+    Column('slot', Integer, primary_key=True),
+    Column('table_id', Integer, primary_key=True),
+    Column('reservation_id', Integer),
+    Column('hold_token', String(32)),
+    Column('hold_expires', Float),
+)
+# Cancelling or editing finds a reservation's cells without a scan
+Index('ix_slot_inventory_reservation', slot_inventory.c.reservation_id)
+
+
+def slot_range(start_time, duration=None):
+    # First and last slot covered by [start, start + duration), clipped to the day
+    start = start_time.hour * 60 + start_time.minute
+    end = start + (duration or DEFAULT_DURATION)
+    return start // SLOT_MINUTES, min((end - 1) // SLOT_MINUTES, SLOTS_PER_DAY - 1)
+
+
+def horizon(today=None):
+    today = today or date.today()
+    return today, today + timedelta(days=HORIZON_DAYS - 1)
+
+
+def covers_statement(day):
+    return select(slot_inventory.c.slot).where(slot_inventory.c.date == day).limit(1)
+
+
+def covers(connection, day):
+    # Dates outside the built inventory fall back to checking reservations
+    return connection.execute(covers_statement(day)).first() is not None
+
+
+def _cells(day, table_id, first, last):
+    return and_(
+        slot_inventory.c.date == day,
+        slot_inventory.c.slot.between(first, last),
+        slot_inventory.c.table_id == table_id,
+    )
+
+
+def _claimable(token, now):
+    # Free, and not held by another host (expired holds count as free)
+    return and_(
+        slot_inventory.c.reservation_id.is_(None),
+        or_(
+            slot_inventory.c.hold_expires.is_(None),
+            slot_inventory.c.hold_expires <= now,
+            slot_inventory.c.hold_token == token,
+        ),
+    )
+
+
+def blocked_tables_statement(day, start_time, duration=None, token=None, now=None):
+    first, last = slot_range(start_time, duration)
+    return select(slot_inventory.c.table_id).distinct().where(
+        slot_inventory.c.date == day,
+        slot_inventory.c.slot.between(first, last),
+        ~_claimable(token, now or time_module.time()),
+    )
+
+
+def blocked_tables(connection, day, start_time, duration=None, token=None, now=None):
+    # Tables with a booked or held cell in the slot range
+    return {row[0] for row in connection.execute(blocked_tables_statement(day, start_time, duration, token, now))}
+
+
+def covered_days(connection, days):
+    # The given days that the built inventory covers
+    return set(connection.execute(
+        select(slot_inventory.c.date).distinct().where(slot_inventory.c.date.in_(days), slot_inventory.c.slot == 0)
+    ).scalars())
+
+
+def blocked_days(connection, table_ids, days, start_time, duration=None, token=None, now=None):
+    # Map table_id -> days on which the table has a booked or held cell in
+    # the slot range: the cells claim_series() would fail on
+    first, last = slot_range(start_time, duration)
+    rows = connection.execute(
+        select(slot_inventory.c.table_id, slot_inventory.c.date).distinct().where(
+            slot_inventory.c.date.in_(days),
+            slot_inventory.c.slot.between(first, last),
+            slot_inventory.c.table_id.in_(table_ids),
+            ~_claimable(token, now or time_module.time()),
+        )
+    ).all()
+    blocked = {}
+    for table_id, day in rows:
+        blocked.setdefault(table_id, set()).add(day)
+    return blocked
+
+
+def claim(connection, reservation_id, table_id, day, start_time, duration=None, token=None, now=None):
+    # Mark the cells as booked; False if any of them is taken, in which case
+    # the caller rolls back. Dates outside the inventory always succeed.
+    if not covers(connection, day):
+        return True
+    first, last = slot_range(start_time, duration)
+    now = now or time_module.time()
+    result = connection.execute(
+        slot_inventory.update()
+        .where(_cells(day, table_id, first, last), _claimable(token, now))
+        .values(reservation_id=reservation_id, hold_token=None, hold_expires=None)
+    )
+    return result.rowcount == last - first + 1
+
+
+def claim_series_statement(series_id, table_id, days, start_time, duration=None, token=None, now=None):
+    # Each cell takes the id of the series' reservation on its date
+    first, last = slot_range(start_time, duration)
+    reservations = table('reservations', column('id'), column('series_id'), column('date'))
+    occurrence = (
+        select(reservations.c.id)
+        .where(reservations.c.series_id == series_id, reservations.c.date == slot_inventory.c.date)
+        .scalar_subquery()
+    )
+    return (
+        slot_inventory.update()
+        .where(
+            slot_inventory.c.date.in_(days),
+            slot_inventory.c.slot.between(first, last),
+            slot_inventory.c.table_id == table_id,
+            _claimable(token, now or time_module.time()),
+        )
+        .values(reservation_id=occurrence, hold_token=None, hold_expires=None)
+    )
+
+
+def claim_series(connection, series_id, table_id, days, start_time, duration=None, token=None, now=None):
+    # Claim the cells of every occurrence of a series in one statement. False
+    # if any cell is taken. Dates outside the inventory are not checked, as in claim().
+    first, last = slot_range(start_time, duration)
+    covered = connection.execute(
+        select(func.count(slot_inventory.c.date.distinct()))
+        .where(slot_inventory.c.date.in_(days), slot_inventory.c.slot == first)
+    ).scalar()
+    if not covered:
+        return True
+    result = connection.execute(
+        claim_series_statement(series_id, table_id, days, start_time, duration, token, now)
+    )
+    return result.rowcount == covered * (last - first + 1)
+
+
+def release(connection, reservation_id):
+    connection.execute(
+        slot_inventory.update()
+        .where(slot_inventory.c.reservation_id == reservation_id)
+        .values(reservation_id=None)
+    )
+
+
+def hold(connection, token, table_id, day, start_time, duration=None, now=None):
+    # Replace the host's previous hold; False if the table was taken meanwhile
+    release_holds(connection, token)
+    if not covers(connection, day):
+        return True
+    first, last = slot_range(start_time, duration)
+    now = now or time_module.time()
+    result = connection.execute(
+        slot_inventory.update()
+        .where(_cells(day, table_id, first, last), _claimable(token, now))
+        .values(hold_token=token, hold_expires=now + HOLD_SECONDS)
+    )
+    return result.rowcount == last - first + 1
+
+
+def release_holds(connection, token):
+    connection.execute(
+        slot_inventory.update()
+        .where(slot_inventory.c.hold_token == token)
+        .values(hold_token=None, hold_expires=None)
+    )
+
+
+def _add_cells(connection, days, table_ids):
+    # Insert the cells of the tables on the days, marking the confirmed
+    # reservations already booked on them
+    grid = np.array(np.meshgrid(np.arange(len(days)), np.arange(SLOTS_PER_DAY), table_ids, indexing='ij')).reshape(3, -1)
+    connection.execute(slot_inventory.insert(), [
+        {'date': days[day], 'slot': int(slot), 'table_id': int(table_id)}
+        for day, slot, table_id in grid.T
+    ])
+
+    booked = connection.execute(text(f"""
+    SELECT id, table_id, date, time, duration FROM reservations
+    WHERE date BETWEEN :first_day AND :end AND table_id IN :table_ids AND status = {STATUS_CODES['confirmed']}
+    """).bindparams(bindparam('table_ids', expanding=True)), {
+        'first_day': day_number(days[0]), 'end': day_number(days[-1]), 'table_ids': [int(table_id) for table_id in table_ids],
+    }).fetchall()
+    if booked:
+        frame = pd.DataFrame(booked, columns=['id', 'table_id', 'date', 'time', 'duration'])
+        starts = minutes_of_day(frame['time'])
+        durations = frame['duration'].astype('float').fillna(DEFAULT_DURATION).to_numpy().astype(int)
+        first_slots = starts // SLOT_MINUTES
+        last_slots = np.minimum((starts + np.maximum(durations, 1) - 1) // SLOT_MINUTES, SLOTS_PER_DAY - 1)
+        spans = last_slots - first_slots + 1
+        # One row per covered cell, expanded without a Python loop per slot
+        offsets = np.arange(spans.sum()) - np.repeat(np.cumsum(spans) - spans, spans)
+        connection.execute(
+            slot_inventory.update()
+            .where(
+                slot_inventory.c.date == bindparam('cell_date'),
+                slot_inventory.c.slot == bindparam('cell_slot'),
+                slot_inventory.c.table_id == bindparam('cell_table'),
+                slot_inventory.c.reservation_id.is_(None),
+            )
+            .values(reservation_id=bindparam('cell_reservation')),
+            [
+                {'cell_date': int(day), 'cell_slot': int(slot), 'cell_table': int(table_id),
+                 'cell_reservation': int(reservation_id)}
+                for day, slot, table_id, reservation_id in zip(
+                    np.repeat(frame['date'].to_numpy(), spans),
+                    np.repeat(first_slots, spans) + offsets,
+                    np.repeat(frame['table_id'].to_numpy(), spans),
+                    np.repeat(frame['id'].to_numpy(), spans),
+                )
+            ],
+        )
+
+
+def extend(connection, table_ids, today=None):
+    # Drop past days, give tables added since the last run cells on the days
+    # already built, and add cells for days entering the horizon. Returns
+    # the number of days added.
+    metadata.create_all(connection)
+    start, end = horizon(today)
+    connection.execute(slot_inventory.delete().where(slot_inventory.c.date < start))
+    built_through = connection.execute(select(slot_inventory.c.date).order_by(slot_inventory.c.date.desc()).limit(1)).scalar()
+    if built_through is not None and table_ids:
+        # Every built day has the same tables, so the last one tells which are missing
+        built = set(connection.execute(
+            select(slot_inventory.c.table_id).where(slot_inventory.c.date == built_through, slot_inventory.c.slot == 0)
+        ).scalars())
+        missing = [table_id for table_id in table_ids if table_id not in built]
+        if missing:
+            _add_cells(connection, pd.date_range(start, min(built_through, end), freq='D').date, missing)
+
+    first_day = max(start, built_through + timedelta(days=1)) if built_through else start
+    if first_day > end or not table_ids:
+        return 0
+    days = pd.date_range(first_day, end, freq='D').date
+    _add_cells(connection, days, table_ids)
+    return len(days)
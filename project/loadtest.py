@@ -0,0 +1,316 @@
+# loadtest.py
+# Local load generator: simulates many hosts driving the real booking flow
+# (get_available_tables -> hold_table -> create_reservation), plus list, edit, delete and
+# analytics traffic, against a throwaway copy of the database.
+#
+#   python loadtest.py --users 25 --duration 60 --think-time 0.5
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time as time_module
+from collections import defaultdict
+from datetime import date, time, timedelta
+
+import numpy as np
+
+from analytics import DEFAULT_DURATION
+from column_types import STATUS_CODES
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Relative weights of each simulated action
+DEFAULT_MIX = {
+    'book': 5,
+    'list': 3,
+    'edit': 1,
+    'delete': 1,
+    'analytics': 1,
+}
+
+# Overlapping confirmed reservations on the same table and day (time is
+# stored as minutes of the day); codes and defaults come from the model
+DOUBLE_BOOKING_QUERY = f"""
+SELECT COUNT(*)
+FROM reservations a
+JOIN reservations b ON a.table_id = b.table_id AND a.date = b.date AND a.id < b.id
+WHERE a.status = {STATUS_CODES['confirmed']} AND b.status = {STATUS_CODES['confirmed']}
+AND a.time < b.time + COALESCE(b.duration, {DEFAULT_DURATION})
+AND b.time < a.time + COALESCE(a.duration, {DEFAULT_DURATION})
+"""
+
+
+def parse_mix(value):
+    mix = dict(DEFAULT_MIX)
+    for item in value.split(','):
+        name, weight = item.split('=')
+        if name not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"Unknown action: {name}")
+        mix[name] = float(weight)
+    return mix
+
+
+def is_lock_error(message):
+    return 'database is locked' in message or 'database table is locked' in message
+
+
+def count_double_bookings(db_path):
+    connection = sqlite3.connect(db_path)
+    try:
+        return connection.execute(DOUBLE_BOOKING_QUERY).fetchone()[0]
+    finally:
+        connection.close()
+
+
+class Stats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.lock_errors = defaultdict(int)
+        self.rejected = defaultdict(int)
+
+    def record(self, action, seconds, error=None, rejected=False):
+        with self._lock:
+            self.latencies[action].append(seconds)
+            if rejected:
+                self.rejected[action] += 1
+            if error is not None:
+                self.errors[action] += 1
+                if is_lock_error(error):
+                    self.lock_errors[action] += 1
+
+
+class SimulatedHost(threading.Thread):
+    def __init__(self, app, user_id, stats, mix, think_time, deadline, location, seed):
+        super().__init__(daemon=True)
+        self.app = app
+        self.user_id = user_id
+        self.stats = stats
+        self.actions = list(mix)
+        self.weights = [mix[action] for action in self.actions]
+        self.think_time = think_time
+        self.deadline = deadline
+        self.location = location
+        self.random = random.Random(seed)
+        self.booked = {}
+        self.hold_token = f"loadtest-{user_id}"
+
+    def think(self):
+        if self.think_time > 0:
+            time_module.sleep(self.random.expovariate(1 / self.think_time))
+
+    def timed(self, action, fn):
+        # Run fn and record its latency; fn returns (error message or None, rejected)
+        started = time_module.perf_counter()
+        try:
+            error, rejected = fn()
+        except Exception as e:
+            error, rejected = str(e), False
+        self.stats.record(action, time_module.perf_counter() - started, error, rejected)
+
+    def random_slot(self):
+        booking_date = date.today() + timedelta(days=self.random.randint(1, 14))
+        minutes = self.random.randrange(11 * 60, 22 * 60, 30)
+        return booking_date, time(minutes // 60, minutes % 60)
+
+    def book(self):
+        booking_date, booking_time = self.random_slot()
+        guest_count = self.random.randint(1, 6)
+        available = []
+
+        def check():
+            available[:] = self.app.get_available_tables(
+                booking_date, booking_time, guest_count, self.location, self.hold_token
+            )
+            return None, not available
+
+        self.timed('availability', check)
+        if not available:
+            return
+        table = self.random.choice(available)
+        held = []
+
+        def hold():
+            held.append(self.app.hold_table(self.hold_token, table.id, booking_date, booking_time, self.location))
+            return None, not held[0]
+
+        self.timed('hold', hold)
+        # Empty when hold_table raised; timed() records the error
+        if not held or not held[0]:
+            return
+        # Host reviews the options before confirming, like the selecting_table step
+        self.think()
+
+        def confirm():
+            success, message = self.app.create_reservation(
+                customer_data={
+                    'name': f"Load Test {self.user_id}",
+                    'email': f"loadtest{self.user_id}@example.com",
+                    'phone': '0000000000',
+                },
+                reservation_data={
+                    'date': booking_date,
+                    'time': booking_time,
+                    'table_id': table.id,
+                    'guest_count': guest_count,
+                },
+                location=self.location,
+                hold_token=self.hold_token,
+            )
+            return (None if success else message), False
+
+        self.timed('book', confirm)
+
+    def list_reservations(self):
+        def fetch():
+            reservations = self.app.get_current_reservations(self.location)
+            # Keep the customer details so edits leave them unchanged, like the edit form
+            self.booked = {} if reservations.empty else {
+                row.id: (row.customer_name, row.customer_email, row.phone)
+                for row in reservations.itertuples()
+            }
+            return None, False
+
+        self.timed('list', fetch)
+
+    def edit(self):
+        if not self.booked:
+            return self.list_reservations()
+        reservation_id = self.random.choice(list(self.booked))
+        customer_name, customer_email, customer_phone = self.booked[reservation_id]
+        booking_date, booking_time = self.random_slot()
+        available = self.app.get_available_tables(booking_date, booking_time, 2, self.location)
+        if not available:
+            return
+
+        def update():
+            success, message = self.app.update_reservation(reservation_id, {
+                'date': booking_date,
+                'time': booking_time,
+                'guest_count': 2,
+                'table_id': available[0].id,
+                'customer_name': customer_name,
+                'customer_email': customer_email,
+                'customer_phone': customer_phone,
+            }, self.location)
+            return (None if success else message), 'not found' in message
+
+        self.timed('edit', update)
+
+    def delete(self):
+        if not self.booked:
+            return self.list_reservations()
+        reservation_id = self.random.choice(list(self.booked))
+        del self.booked[reservation_id]
+
+        def remove():
+            success, message = self.app.delete_reservation(reservation_id, self.location)
+            # Another host deleting it first is a normal outcome, not an error
+            if not success and 'not found' in message:
+                return None, True
+            return (None if success else message), False
+
+        self.timed('delete', remove)
+
+    def analytics(self):
+        end_date = date.today()
+        start_date = end_date - timedelta(days=365)
+
+        def report():
+            filters = self.app.AnalyticsFilter(start_date, end_date, "All Sections", 1, 20)
+            with self.app.analytics_connections(self.location) as connections:
+                self.app.fetch_key_metrics(filters, self.location, connections)
+                self.app.get_daily_reservations(filters, self.location, connections)
+            return None, False
+
+        self.timed('analytics', report)
+
+    def run(self):
+        handlers = {
+            'book': self.book,
+            'list': self.list_reservations,
+            'edit': self.edit,
+            'delete': self.delete,
+            'analytics': self.analytics,
+        }
+        while time_module.monotonic() < self.deadline:
+            action = self.random.choices(self.actions, weights=self.weights)[0]
+            handlers[action]()
+            self.think()
+
+
+def print_report(stats, elapsed, double_bookings):
+    total = sum(len(latencies) for latencies in stats.latencies.values())
+    print(f"\nLoad Test Results ({elapsed:.1f}s)")
+    print(f"Operations: {total} ({total / elapsed:.1f} ops/s)")
+    print(f"{'Operation':<14}{'Count':>8}{'ops/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"{'max ms':>9}{'Errors':>8}{'Locked':>8}{'Rejected':>10}")
+    for action in sorted(stats.latencies):
+        latencies = np.array(stats.latencies[action]) * 1000
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        print(f"{action:<14}{len(latencies):>8}{len(latencies) / elapsed:>8.1f}{p50:>9.1f}{p95:>9.1f}{p99:>9.1f}"
+              f"{latencies.max():>9.1f}{stats.errors[action]:>8}{stats.lock_errors[action]:>8}{stats.rejected[action]:>10}")
+    print(f"Lock timeouts: {sum(stats.lock_errors.values())}")
+    print(f"New double bookings: {double_bookings}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate concurrent hosts against a copy of the database.")
+    parser.add_argument('--users', type=int, default=10, help="Number of concurrent simulated hosts")
+    parser.add_argument('--duration', type=float, default=30, help="Test length in seconds")
+    parser.add_argument('--think-time', type=float, default=1.0, help="Mean think time between actions in seconds")
+    parser.add_argument('--mix', type=parse_mix, default=dict(DEFAULT_MIX),
+                        help="Action weights, e.g. book=5,list=3,edit=1,delete=1,analytics=1")
+    parser.add_argument('--data-dir', default=os.path.join(BASE_DIR, 'data'), help="Data directory to copy")
+    parser.add_argument('--location', default=None, help="Location to drive (default location if omitted)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--keep', action='store_true', help="Keep the copied data directory")
+    args = parser.parse_args()
+
+    # Work on a copy so the real databases are never touched
+    work_dir = tempfile.mkdtemp(prefix='restaurant_loadtest_')
+    data_dir = os.path.join(work_dir, 'data')
+    shutil.copytree(args.data_dir, data_dir, ignore=shutil.ignore_patterns('snapshots', 'exports'))
+    os.environ['RESTAURANT_DATA_DIR'] = data_dir
+
+    # Streamlit calls outside a running app only log warnings
+    os.environ.setdefault('STREAMLIT_LOGGER_LEVEL', 'error')
+    sys.path.insert(0, BASE_DIR)
+    import main as app
+
+    location = args.location or app.router.default_location
+    if not os.path.exists(app.router.path_for(location)):
+        app.init_db(location)
+    app.ensure_schema(location)
+    db_path = app.router.path_for(location)
+    baseline_double_bookings = count_double_bookings(db_path)
+
+    print(f"Running {args.users} hosts for {args.duration:.0f}s against {db_path}")
+    stats = Stats()
+    deadline = time_module.monotonic() + args.duration
+    started = time_module.monotonic()
+    hosts = [
+        SimulatedHost(app, user_id, stats, args.mix, args.think_time, deadline, location, args.seed + user_id)
+        for user_id in range(args.users)
+    ]
+    for host in hosts:
+        host.start()
+    for host in hosts:
+        host.join()
+    elapsed = time_module.monotonic() - started
+
+    print_report(stats, elapsed, count_double_bookings(db_path) - baseline_double_bookings)
+
+    if args.keep:
+        print(f"Database copy kept in {data_dir}")
+    else:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,43 @@
 import streamlit as st
+import itertools
 import os
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, ForeignKey, Date, Time, text
+import uuid
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Date, Time, Text, text, insert, select, bindparam, column
 from sqlalchemy.sql import func, extract
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship, sessionmaker
+from sqlalchemy.orm import relationship
 from datetime import datetime, timedelta
 import pandas as pd
 from sqlalchemy import text
 import numpy as np
+from collections import Counter
+from contextlib import contextmanager, ExitStack
+from sharding import LocationRouter, ALL_LOCATIONS
+from snapshots import SnapshotManager
+from analytics import occupancy_heatmap, seat_hour_utilization, DEFAULT_DURATION, SERVICE_PERIODS
+import altair as alt
+from exports import export_report, read_export, prune_exports, EXPORT_FORMATS, EXPORT_DIR, MIME_TYPES
+from state_store import shared_store, table_slots
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+import query_builder
+from query_builder import AnalyticsFilter, ALL_SECTIONS
+from scheduler import Scheduler
+from state_store import DEFAULT_MAX_AGE as SHARED_DATA_MAX_AGE
+import inventory
+import migrations
+from column_types import (
+    DayNumber, MinuteOfDay, StatusCode, STATUS_CODES, STATUS_NAMES,
+    day_number, date_sql, time_sql, status_sql,
+)
+from profiling import profiler
+from columnar import ColumnarStoreManager, ANALYTICS_BACKEND, install_change_log, remove_change_log
+from forecasting import ForecastManager
+from series import REPEAT_OPTIONS, occurrence_dates, find_conflicts, parse_exceptions, format_exceptions
 
 # Get the current directory
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-# Create data directory if it doesn't exist
-DATA_DIR = os.path.join(BASE_DIR, 'data')
+# Create data directory if it doesn't exist (RESTAURANT_DATA_DIR points the app at another copy)
+DATA_DIR = os.environ.get('RESTAURANT_DATA_DIR', os.path.join(BASE_DIR, 'data'))
 os.makedirs(DATA_DIR, exist_ok=True)
 
 # Database path
@@ -50,33 +75,121 @@ class Customer(Base):
 class Reservation(Base):
     __tablename__ = 'reservations'
     id = Column(Integer, primary_key=True)
-    date = Column(Date, nullable=False)
-    time = Column(Time, nullable=False)
+    # Stored as day number, minute of the day and status code
+    date = Column(DayNumber, nullable=False)
+    time = Column(MinuteOfDay, nullable=False)
+    duration = Column(Integer, default=DEFAULT_DURATION)
     table_id = Column(Integer, ForeignKey('tables.id'))
     customer_id = Column(Integer, ForeignKey('customers.id'))
     guest_count = Column(Integer, nullable=False)
-    status = Column(String(20), default='confirmed')
+    status = Column(StatusCode, default='confirmed')
+    series_id = Column(Integer, ForeignKey('reservation_series.id'))
     created_at = Column(DateTime, default=datetime.utcnow)
     table = relationship('Table', back_populates='reservations')
     customer = relationship('Customer', back_populates='reservations')
+    series = relationship('ReservationSeries', back_populates='reservations')
+    # Indexes are declared in migrations.INDEXES
 
-# Create engine
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(bind=engine)
-
-def execute_prepared_statement(query, params=None):
-    with engine.connect() as connection:
+class ReservationSeries(Base):
+    __tablename__ = 'reservation_series'
+    id = Column(Integer, primary_key=True)
+    customer_id = Column(Integer, ForeignKey('customers.id'))
+    table_id = Column(Integer, ForeignKey('tables.id'))
+    start_date = Column(Date, nullable=False)
+    end_date = Column(Date, nullable=False)
+    time = Column(Time, nullable=False)
+    duration = Column(Integer, default=DEFAULT_DURATION)
+    guest_count = Column(Integer, nullable=False)
+    frequency = Column(String(10), nullable=False)
+    interval = Column(Integer, default=1)
+    # Comma-separated ISO dates skipped by the series
+    exceptions = Column(Text, default='')
+    status = Column(String(20), default='active')
+    created_at = Column(DateTime, default=datetime.utcnow)
+    reservations = relationship('Reservation', back_populates='series')
+
+# Process-wide resources: Streamlit re-executes this script on every rerun,
+# so engines and caches are created once and shared by all sessions
+@st.cache_resource
+def get_router():
+    # Route each location to its own database; the default location keeps using DB_PATH
+    return LocationRouter(DATA_DIR, default_path=DB_PATH)
+
+@st.cache_resource
+def get_snapshots():
+    # Analytics read from periodically refreshed read-only copies, never the live databases
+    return SnapshotManager(get_router())
+
+@st.cache_resource
+def get_columnar_stores():
+    # Optional columnar copies for the analytics page (ANALYTICS_BACKEND=columnar)
+    if ANALYTICS_BACKEND != 'columnar':
+        return None
+    return ColumnarStoreManager(get_router(), get_snapshots())
+
+@st.cache_resource
+def get_forecasts():
+    # Demand models per location, fitted incrementally on the snapshots
+    return ForecastManager(get_router(), get_snapshots())
+
+@st.cache_resource
+def get_checked_schemas():
+    # Locations whose schema has been checked by this process
+    return set()
+
+router = get_router()
+snapshots = get_snapshots()
+columnar_stores = get_columnar_stores()
+forecasts = get_forecasts()
+
+# Engine and session factory for the default location
+engine = router.engine()
+SessionLocal = router.sessionmaker()
+
+# Page size of the reservations table
+RESERVATIONS_PAGE_SIZE = 50
+
+def execute_prepared_statement(query, params=None, location=None):
+    # Returns (rows, column names), fetched before the connection closes
+    with router.engine(location).connect() as connection:
         if params is None:
             params = {}
         result = connection.execute(text(query), params)
-        return result
-
-def init_db():
+        return result.fetchall(), list(result.keys())
+
+def ensure_schema(location=None):
+    location = location or router.default_location
+    checked = get_checked_schemas()
+    if location in checked:
+        return
+    location_engine = router.engine(location)
+    # Pending migrations and the managed index set, applied in place
+    applied, changed_indexes = migrations.upgrade(location_engine, Base.metadata)
+    with location_engine.begin() as connection:
+        # The columnar backend refreshes from a log of changed days
+        if columnar_stores is not None:
+            install_change_log(connection)
+        else:
+            remove_change_log(connection)
+    extend_inventory(location)
+    if applied or changed_indexes:
+        # The analytics snapshot still holds the old schema
+        snapshots.get(location).refresh()
+    checked.add(location)
+
+def extend_inventory(location=None):
+    # Keep the slot inventory covering the rolling horizon
+    with router.engine(location).begin() as connection:
+        table_ids = [row[0] for row in connection.execute(text("SELECT id FROM tables ORDER BY id"))]
+        return inventory.extend(connection, table_ids)
+
+def init_db(location=None):
+    session = None
     try:
-        # Create tables
-        Base.metadata.create_all(engine)
+        # Create tables at the current schema version
+        ensure_schema(location)
         
-        session = SessionLocal()
+        session = router.session(location)
         
         # Check if we need to add initial data
         if session.query(Section).count() == 0:
@@ -100,13 +213,17 @@ def init_db():
             ]
             session.add_all(tables)
             session.commit()
+            # The schema check built no slot cells while there were no tables
+            extend_inventory(location)
             st.success("Database initialized with sample data!")
         
     except Exception as e:
         st.error(f"Error initializing database: {e}")
     finally:
-        session.close()
+        if session is not None:
+            session.close()
 
+@profiler.track
 def format_reservations_display(df):
     if not df.empty:
         # Create a copy to avoid modifying the original
@@ -126,7 +243,221 @@ def format_reservations_display(df):
         return formatted_df
     return pd.DataFrame()
 
-def get_current_reservations():
+def data_changed(location=None):
+    # Invalidate shared cached data for the location after a write
+    shared_store.bump(location or router.default_location)
+
+@profiler.track
+def get_shared_reservations(location=None):
+    # One DataFrame per location and data version, shared by every session
+    location = location or router.default_location
+    return shared_store.get('reservations', location, lambda: get_current_reservations(location))
+
+def record_session_footprint():
+    ctx = get_script_run_ctx()
+    if ctx is not None:
+        shared_store.record_session(ctx.session_id, {key: st.session_state[key] for key in st.session_state})
+
+# Integer day and minute columns make the end time plain arithmetic; the date
+# bound lets the partial index on confirmed rows narrow the scan
+COMPLETE_PAST_RESERVATIONS = text(f"""
+UPDATE reservations SET status = {STATUS_CODES['completed']}
+WHERE status = {STATUS_CODES['confirmed']}
+AND date <= :today
+AND date * 1440 + time + COALESCE(duration, :default_duration) <= :now
+""")
+
+def completion_params(now):
+    return {
+        'default_duration': DEFAULT_DURATION,
+        'today': day_number(now),
+        'now': day_number(now) * 1440 + now.hour * 60 + now.minute,
+    }
+
+def complete_past_reservations(location=None):
+    # Confirmed reservations whose time slot has ended become 'completed'
+    with router.engine(location).begin() as connection:
+        result = connection.execute(COMPLETE_PAST_RESERVATIONS, completion_params(datetime.now()))
+    if result.rowcount:
+        data_changed(location)
+    return result.rowcount
+
+def optimize_database(location=None):
+    # VACUUM cannot run inside a transaction
+    with router.engine(location).connect() as connection:
+        connection = connection.execution_options(isolation_level="AUTOCOMMIT")
+        connection.exec_driver_sql("ANALYZE")
+        connection.exec_driver_sql("VACUUM")
+
+def warm_caches(location=None):
+    get_shared_reservations(location)
+
+# Busiest forecast dates warmed ahead of the hosts
+PREWARM_DAYS = 3
+
+def prewarm_busy_days(location=None):
+    # Load what hosts read first on the forecast's busiest upcoming dates:
+    # the shared reservation listing, the analytics snapshot and the
+    # availability lookup of every service slot, which pages in the
+    # inventory cells behind it. Returns the number of lookups run.
+    get_shared_reservations(location)
+    snapshots.get(location).ensure_fresh()
+    days = forecasts.get(location).busiest_days(PREWARM_DAYS)
+    starts = [
+        (datetime.min + timedelta(minutes=minute)).time()
+        for opens, closes in SERVICE_PERIODS.values()
+        for minute in range(opens, closes, inventory.SLOT_MINUTES)
+    ]
+    lookups = 0
+    with router.engine(location).connect() as connection:
+        for day in days:
+            if inventory.covers(connection, day):
+                for start in starts:
+                    inventory.blocked_tables(connection, day, start)
+                lookups += len(starts)
+    return lookups
+
+def for_each_location(job):
+    return lambda: [job(location) for location in router.locations()]
+
+@st.cache_resource
+def get_scheduler():
+    # Maintenance jobs run on a background thread, once across all app processes
+    scheduler = Scheduler(os.path.join(DATA_DIR, 'scheduler.db'))
+    scheduler.register('complete_past_reservations', for_each_location(complete_past_reservations), interval=5 * 60)
+    scheduler.register(
+        'refresh_snapshots', lambda: snapshots.refresh(ALL_LOCATIONS),
+        interval=snapshots.max_age.total_seconds(),
+    )
+    if columnar_stores is not None:
+        # Incremental: only months changed since the last refresh are rewritten
+        scheduler.register(
+            'refresh_columnar', lambda: columnar_stores.refresh(ALL_LOCATIONS),
+            interval=snapshots.max_age.total_seconds(),
+        )
+    scheduler.register('warm_caches', for_each_location(warm_caches), interval=SHARED_DATA_MAX_AGE)
+    scheduler.register('extend_inventory', for_each_location(extend_inventory), at=['00:05'])
+    # Incremental: each retrain folds in only the days that ended since the last one
+    scheduler.register('retrain_forecasts', lambda: forecasts.retrain(ALL_LOCATIONS), at=['00:10'])
+    scheduler.register('prewarm_busy_days', for_each_location(prewarm_busy_days), interval=5 * 60)
+    scheduler.register('optimize_databases', for_each_location(optimize_database), at=['03:30'])
+    scheduler.register('prune_exports', lambda: prune_exports(os.path.join(DATA_DIR, EXPORT_DIR)), interval=60 * 60)
+    if os.environ.get('RESTAURANT_SCHEDULER', '1') != '0':
+        scheduler.start()
+    return scheduler
+
+def show_job_report(scheduler):
+    with st.sidebar.expander("Background Jobs"):
+        st.dataframe(scheduler.metrics(), hide_index=True, use_container_width=True)
+        job_name = st.selectbox("Job", list(scheduler.jobs))
+        if st.button("Run Now"):
+            if scheduler.run_job(job_name, force=True):
+                st.success(f"Ran {job_name}.")
+            else:
+                st.warning(f"{job_name} is already running elsewhere.")
+
+def show_profiler_report():
+    with st.sidebar.expander("Profiler"):
+        enabled = st.checkbox("Profile reruns", value=profiler.enabled)
+        if enabled != profiler.enabled:
+            profiler.enable(enabled)
+        if profiler.reruns:
+            st.caption(f"{profiler.reruns} reruns, {profiler.samples} samples, "
+                       f"{profiler.rerun_seconds / profiler.reruns * 1000:.0f} ms per rerun on average")
+        st.caption("Hotspots")
+        st.dataframe(profiler.hotspots(), hide_index=True, use_container_width=True)
+        st.caption("Data access")
+        st.dataframe(profiler.function_timings(), hide_index=True, use_container_width=True)
+        st.download_button(
+            "Download Flamegraph Stacks", profiler.collapsed_stacks(),
+            file_name='reruns.folded', mime='text/plain',
+        )
+        if st.button("Reset Profile"):
+            profiler.reset()
+
+def hot_queries():
+    # (name, table as named in the plan, statement, params, expected indexes)
+    # for migrations.check_query_plans: the statements the app itself runs,
+    # with representative values
+    today = datetime.now()
+    day = today.date()
+    year_ago = day - timedelta(days=365)
+    dinner = datetime.strptime('19:00', '%H:%M').time()
+    booked_indexes = ['ix_reservations_booked_date', 'ix_reservations_status_date', 'ix_reservations_date_table_time']
+    queries = [
+        # The overlap checks name the partial index on confirmed reservations
+        ('Table availability', 'reservations', table_conflict_statement(1, day, dinner), {},
+         ['ix_reservations_confirmed_table_date']),
+        ('Series conflicts', 'reservations', series_conflicts_statement([1, 2], day, day + timedelta(days=365)), {},
+         ['ix_reservations_confirmed_table_date']),
+        ('Complete past reservations', 'reservations', COMPLETE_PAST_RESERVATIONS, completion_params(today),
+         ['ix_reservations_status_date', 'ix_reservations_confirmed_table_date']),
+        ('Customer by email', 'customers', customer_by_email_statement('guest@example.com'), {},
+         ['sqlite_autoindex_customers_1']),
+        ('Inventory coverage', 'slot_inventory', inventory.covers_statement(day), {},
+         ['sqlite_autoindex_slot_inventory_1']),
+        ('Blocked tables', 'slot_inventory', inventory.blocked_tables_statement(day, dinner), {},
+         ['sqlite_autoindex_slot_inventory_1']),
+        # The correlated lookup of each cell's reservation is by series and date
+        ('Claim series cells', 'slot_inventory', inventory.claim_series_statement(1, 1, [day], dinner), {},
+         ['ix_reservations_series_id', 'ix_reservations_date_table_time']),
+    ]
+    # Every analytics query in every filter shape
+    for name in query_builder.QUERIES:
+        for shape in itertools.product((False, True), repeat=3):
+            has_section, has_guests, has_status = shape
+            filters = AnalyticsFilter(
+                year_ago, day, 'Main Floor' if has_section else ALL_SECTIONS,
+                1 if has_guests else None, 20 if has_guests else None,
+                query_builder.BOOKED_STATUSES if has_status else None,
+            )
+            label = ', '.join(part for part, used in zip(('section', 'guests', 'status'), shape) if used)
+            queries.append((
+                f"Analytics {name} ({label or 'dates only'})", 'reservations', query_builder.statement(name, shape),
+                dict(filters.params(), default_duration=DEFAULT_DURATION), booked_indexes,
+            ))
+    export_params = {
+        'start_date': day_number(year_ago), 'end_date': day_number(day), 'min_guest_count': 1,
+        'max_guest_count': 20, 'selected_section': ALL_SECTIONS,
+    }
+    for report, query in EXPORT_REPORTS.items():
+        queries.append((f"{report} export", 'r', text(query), export_params, booked_indexes))
+    return queries
+
+
+def show_schema_report(location=None):
+    with st.sidebar.expander("Schema & Indexes"):
+        with router.engine(location).connect() as connection:
+            version = connection.exec_driver_sql("PRAGMA user_version").scalar()
+            indexes = migrations.index_report(connection)
+        st.caption(f"Schema version {version} of {migrations.SCHEMA_VERSION}")
+        st.dataframe(indexes, hide_index=True, use_container_width=True)
+        # Planning every hot statement takes tens of milliseconds; only on request
+        if st.button("Check Query Plans"):
+            with router.engine(location).connect() as connection:
+                plans = migrations.check_query_plans(connection, hot_queries())
+            st.dataframe(plans, hide_index=True, use_container_width=True)
+            slow = plans.loc[plans['Full scan'] | ~plans['Indexed'], 'Query']
+            if slow.empty:
+                st.success(f"All {len(plans)} hot queries use their indexes.")
+            else:
+                st.warning(f"Not using their indexes: {', '.join(slow)}")
+        if st.button("Rebuild Statistics"):
+            optimize_database(location)
+            st.success("Ran ANALYZE and VACUUM.")
+
+def show_memory_report():
+    with st.sidebar.expander("Memory Report"):
+        # Sizing the shared frames walks all of them; only on request
+        if st.button("Measure Memory"):
+            sessions, entries = shared_store.memory_report()
+            st.caption("Per-session state")
+            st.dataframe(sessions, hide_index=True, use_container_width=True)
+            st.caption("Shared data")
+            st.dataframe(entries, hide_index=True, use_container_width=True)
+
+@profiler.track
+def get_current_reservations(location=None):
     query = """
     SELECT 
         r.id AS id,
@@ -144,23 +475,16 @@ def get_current_reservations():
     ORDER BY r.date, r.time
     """
     params = {}
-    result = execute_prepared_statement(query, params)
+    rows, columns = execute_prepared_statement(query, params, location)
 
     # Convert the result to a DataFrame
-    df = pd.DataFrame(result.fetchall(), columns=result.keys())
+    df = pd.DataFrame(rows, columns=columns)
 
     if not df.empty:
-        # Format the date column
-        df['date'] = pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d')
-
-        # Handle mixed time formats
-        def parse_time(time_str):
-            try:
-                return pd.to_datetime(time_str, format='%H:%M:%S.%f').strftime('%I:%M %p')
-            except ValueError:
-                return pd.to_datetime(time_str, format='%H:%M:%S').strftime('%I:%M %p')
-
-        df['time'] = df['time'].astype(str).apply(parse_time)
+        # Decode day numbers, minutes of the day and status codes
+        df['date'] = pd.to_datetime(df['date'], unit='D').dt.strftime('%Y-%m-%d')
+        df['time'] = pd.to_datetime(df['time'], unit='m').dt.strftime('%I:%M %p')
+        df['status'] = df['status'].map(STATUS_NAMES)
 
         # Sort DataFrame by 'id' column
         df = df.sort_values(by='id', ascending=True).reset_index(drop=True)
@@ -168,8 +492,9 @@ def get_current_reservations():
     return df
 
 
-def delete_reservation(reservation_id):
-    session = SessionLocal()
+@profiler.track
+def delete_reservation(reservation_id, location=None):
+    session = router.session(location)
     try:
         # Debug print
         st.write(f"Attempting to delete reservation with ID: {reservation_id}")
@@ -181,8 +506,11 @@ def delete_reservation(reservation_id):
         st.write(f"Found reservation: {reservation}")
         
         if reservation:
+            # Free the slot cells in the same transaction
+            inventory.release(session.connection(), reservation.id)
             session.delete(reservation)
             session.commit()
+            data_changed(location)
             return True, "Reservation deleted successfully!"
         return False, f"Reservation with ID {reservation_id} not found."
     except Exception as e:
@@ -191,8 +519,9 @@ def delete_reservation(reservation_id):
     finally:
         session.close()
     
-def update_reservation(reservation_id, update_data):
-    session = SessionLocal()
+@profiler.track
+def update_reservation(reservation_id, update_data, location=None):
+    session = router.session(location)
     try:
         # Get the reservation and associated customer
         reservation = session.query(Reservation).filter_by(id=int(reservation_id)).first()
@@ -209,8 +538,17 @@ def update_reservation(reservation_id, update_data):
         reservation.customer.name = update_data['customer_name']
         reservation.customer.email = update_data['customer_email']
         reservation.customer.phone = update_data['customer_phone']
+
+        # Move the reservation's cells; fails if the new slot was taken meanwhile
+        connection = session.connection()
+        inventory.release(connection, reservation.id)
+        if not inventory.claim(connection, reservation.id, reservation.table_id, reservation.date,
+                               reservation.time, reservation.duration):
+            session.rollback()
+            return False, "That table was just booked for this time. Please choose another table."
         
         session.commit()
+        data_changed(location)
         return True, "Reservation updated successfully!"
     except Exception as e:
         session.rollback()
@@ -218,39 +556,82 @@ def update_reservation(reservation_id, update_data):
     finally:
         session.close()
 
-def get_available_tables(date, time, guest_count):
-    session = SessionLocal()
+# Overlap checks for dates beyond the slot inventory. The status is a
+# literal and the index is named: SQLite only matches the partial index on
+# confirmed reservations against a constant, and with few non-confirmed rows
+# its statistics tie with the index over every status.
+TABLE_CONFLICT = text(f"""
+SELECT id FROM reservations INDEXED BY ix_reservations_confirmed_table_date
+WHERE table_id = :table_id AND date = :date AND status = {STATUS_CODES['confirmed']}
+AND time BETWEEN :earliest AND :latest
+LIMIT 1
+""")
+SERIES_CONFLICTS = text(f"""
+SELECT table_id, date, time, duration FROM reservations INDEXED BY ix_reservations_confirmed_table_date
+WHERE table_id IN :table_ids AND date BETWEEN :first_day AND :last_day AND status = {STATUS_CODES['confirmed']}
+""").bindparams(bindparam('table_ids', expanding=True)).columns(
+    column('table_id', Integer), column('date', DayNumber), column('time', Integer), column('duration', Integer),
+)
+
+def table_conflict_statement(table_id, date, time):
+    # A confirmed reservation on the table within two hours of the time
+    minute = time.hour * 60 + time.minute
+    return TABLE_CONFLICT.bindparams(
+        table_id=table_id, date=day_number(date), earliest=minute - 120, latest=minute + 120,
+    )
+
+@profiler.track
+def get_available_tables(date, time, guest_count, location=None, hold_token=None):
+    session = router.session(location)
     try:
         suitable_tables = session.query(Table).filter(Table.capacity >= guest_count).all()
+        connection = session.connection()
+        if inventory.covers(connection, date):
+            # One indexed lookup of booked or held cells; a host's own hold
+            # does not hide the table from them
+            blocked = inventory.blocked_tables(connection, date, time, token=hold_token)
+            return [table for table in suitable_tables if table.id not in blocked]
+        # Dates beyond the inventory horizon are checked against reservations
         available_tables = []
         for table in suitable_tables:
-            reservation_exists = session.query(Reservation).filter(
-                Reservation.table_id == table.id,
-                Reservation.date == date,
-                Reservation.time.between(
-                    (datetime.combine(date, time) - timedelta(hours=2)).time(),
-                    (datetime.combine(date, time) + timedelta(hours=2)).time()
-                )
-            ).first()
+            reservation_exists = session.execute(table_conflict_statement(table.id, date, time)).first()
             if not reservation_exists:
                 available_tables.append(table)
         return available_tables
     finally:
         session.close()
 
-def create_reservation(customer_data, reservation_data):
-    session = SessionLocal()
+def hold_table(hold_token, table_id, date, time, location=None):
+    # Reserve the table's cells for this host while they confirm; replaces
+    # any earlier hold with the same token
+    with router.engine(location).begin() as connection:
+        return inventory.hold(connection, hold_token, table_id, date, time)
+
+def release_table_hold(hold_token, location=None):
+    with router.engine(location).begin() as connection:
+        inventory.release_holds(connection, hold_token)
+
+def customer_by_email_statement(email):
+    return select(Customer).filter_by(email=email)
+
+def get_or_create_customer(session, customer_data):
+    # Check if customer exists
+    customer = session.scalars(customer_by_email_statement(customer_data['email'])).first()
+    if not customer:
+        customer = Customer(
+            name=customer_data['name'],
+            email=customer_data['email'],
+            phone=customer_data['phone']
+        )
+        session.add(customer)
+        session.flush()
+    return customer
+
+@profiler.track
+def create_reservation(customer_data, reservation_data, location=None, hold_token=None):
+    session = router.session(location)
     try:
-        # Check if customer exists
-        customer = session.query(Customer).filter_by(email=customer_data['email']).first()
-        if not customer:
-            customer = Customer(
-                name=customer_data['name'],
-                email=customer_data['email'],
-                phone=customer_data['phone']
-            )
-            session.add(customer)
-            session.flush()
+        customer = get_or_create_customer(session, customer_data)
 
         # Create reservation
         reservation = Reservation(
@@ -261,7 +642,14 @@ def create_reservation(customer_data, reservation_data):
             guest_count=reservation_data['guest_count']
         )
         session.add(reservation)
+        session.flush()
+        # Claim the slot cells atomically with the insert; the host's own hold counts as free
+        if not inventory.claim(session.connection(), reservation.id, reservation.table_id, reservation.date,
+                               reservation.time, reservation.duration, token=hold_token):
+            session.rollback()
+            return False, "That table was just booked for this time. Please choose another table."
         session.commit()
+        data_changed(location)
         return True, "Reservation created successfully!"
     except Exception as e:
         session.rollback()
@@ -269,124 +657,212 @@ def create_reservation(customer_data, reservation_data):
     finally:
         session.close()
 
-def fetch_key_metrics(start_date, end_date, selected_section, min_guest_count, max_guest_count):
+def series_conflicts_statement(table_ids, first_date, last_date):
+    return SERIES_CONFLICTS.bindparams(
+        table_ids=list(table_ids), first_day=day_number(first_date), last_day=day_number(last_date),
+    )
+
+def fetch_series_conflicts(session, table_ids, occurrences, time, duration=DEFAULT_DURATION):
+    # Dates the inventory covers conflict when a cell the series would claim
+    # is booked or held, exactly as claim_series() sees them. Later dates are
+    # checked against reservations: one query covering every candidate table
+    # over their range, then a vectorized overlap check.
+    connection = session.connection()
+    covered = inventory.covered_days(connection, occurrences)
+    uncovered = [value for value in occurrences if value not in covered]
+    conflicts = {}
+    if uncovered:
+        rows = session.execute(series_conflicts_statement(table_ids, uncovered[0], uncovered[-1])).all()
+        existing = pd.DataFrame(rows, columns=['table_id', 'date', 'time', 'duration'])
+        conflicts = find_conflicts(uncovered, time, duration, existing)
+    if covered:
+        blocked = inventory.blocked_days(connection, table_ids, sorted(covered), time, duration)
+        for table_id, days in blocked.items():
+            conflicts[table_id] = sorted(days.union(conflicts.get(table_id, [])))
+    return conflicts
+
+@profiler.track
+def get_series_availability(series_data, guest_count, location=None):
+    # Returns (occurrences, [(table, conflicting dates)]) for tables free on at least one occurrence
+    occurrences = occurrence_dates(
+        series_data['start_date'], series_data['frequency'], series_data['interval'],
+        until=series_data['until'], exceptions=series_data.get('exceptions', ()),
+    )
+    if not occurrences:
+        return occurrences, []
+    session = router.session(location)
     try:
-        # Base query for Total Reservations
-        base_query = """
-        SELECT COUNT(r.id) AS total_reservations
-        FROM reservations r
-        LEFT JOIN tables t ON r.table_id = t.id
-        LEFT JOIN sections s ON t.section_id = s.id
-        WHERE r.date BETWEEN :start_date AND :end_date
-        AND r.status = 'confirmed'
-        """
-
-        # Add filters for section and guest count
-        filters = []
-        if selected_section != "All Sections":
-            filters.append("s.name = :selected_section")
-        filters.append("r.guest_count BETWEEN :min_guest_count AND :max_guest_count")
-        if filters:
-            base_query += " AND " + " AND ".join(filters)
-
-        # Parameters for the query
-        params = {
-            'start_date': start_date,
-            'end_date': end_date,
-            'selected_section': selected_section,
-            'min_guest_count': min_guest_count,
-            'max_guest_count': max_guest_count,
-        }
+        suitable_tables = session.query(Table).filter(Table.capacity >= guest_count).order_by(Table.number).all()
+        conflicts = fetch_series_conflicts(
+            session, [table.id for table in suitable_tables], occurrences, series_data['time']
+        )
+        candidates = [(table, conflicts.get(table.id, [])) for table in suitable_tables]
+        candidates = [(table, dates) for table, dates in candidates if len(dates) < len(occurrences)]
+        candidates.sort(key=lambda candidate: len(candidate[1]))
+        return occurrences, candidates
+    finally:
+        session.close()
+
+@profiler.track
+def create_reservation_series(customer_data, series_data, location=None):
+    session = router.session(location)
+    try:
+        customer = get_or_create_customer(session, customer_data)
+        exceptions = set(series_data.get('exceptions', ()))
+        occurrences = occurrence_dates(
+            series_data['start_date'], series_data['frequency'], series_data['interval'],
+            until=series_data['until'], exceptions=exceptions,
+        )
+        if not occurrences:
+            return False, "The series has no dates."
+
+        # Re-check inside the transaction; dates taken since the availability
+        # check are skipped rather than double-booked
+        conflicts = fetch_series_conflicts(
+            session, [series_data['table_id']], occurrences, series_data['time']
+        ).get(series_data['table_id'], [])
+        exceptions.update(conflicts)
+        booked_dates = [value for value in occurrences if value not in exceptions]
+        if not booked_dates:
+            return False, "The table is no longer free on any date of the series."
+
+        series = ReservationSeries(
+            customer_id=customer.id,
+            table_id=series_data['table_id'],
+            start_date=series_data['start_date'],
+            end_date=series_data['until'],
+            time=series_data['time'],
+            guest_count=series_data['guest_count'],
+            frequency=series_data['frequency'],
+            interval=series_data['interval'],
+            exceptions=format_exceptions(exceptions),
+        )
+        session.add(series)
+        session.flush()
+
+        # Materialize every occurrence with a single bulk insert
+        session.execute(insert(Reservation), [
+            {
+                'date': value,
+                'time': series_data['time'],
+                'duration': DEFAULT_DURATION,
+                'table_id': series_data['table_id'],
+                'customer_id': customer.id,
+                'guest_count': series_data['guest_count'],
+                'status': 'confirmed',
+                'series_id': series.id,
+            }
+            for value in booked_dates
+        ])
+        # Claim every occurrence's cells in one statement
+        if not inventory.claim_series(session.connection(), series.id, series_data['table_id'], booked_dates,
+                                      series_data['time']):
+            session.rollback()
+            return False, "The table was just booked on a date of the series. Please check availability again."
+        session.commit()
+        data_changed(location)
+        message = f"Recurring reservation created with {len(booked_dates)} dates!"
+        if len(booked_dates) < len(occurrences):
+            message += f" Skipped {len(occurrences) - len(booked_dates)} unavailable dates."
+        return True, message
+    except Exception as e:
+        session.rollback()
+        return False, str(e)
+    finally:
+        session.close()
+
+@contextmanager
+def analytics_connections(location=None):
+    # One pooled snapshot connection per location, shared by every analytics
+    # query in a page render
+    with ExitStack() as stack:
+        connections = {}
+        for loc in router.resolve(location):
+            snapshot = snapshots.get(loc)
+            snapshot.ensure_fresh()
+            connections[loc] = stack.enter_context(snapshot.engine().connect())
+        yield connections
+
+def covering_store(filters, location):
+    # The location's columnar store if it can answer the filters, else None
+    if columnar_stores is None or not columnar_stores.get(location).covers(filters):
+        return None
+    store = columnar_stores.get(location)
+    store.ensure_built()
+    return store
+
+def run_analytics_query(name, filters, location, connections=None, **extra_params):
+    # Run a named query_builder statement on one location's snapshot
+    store = covering_store(filters, location)
+    if store is not None:
+        # The columnar copy answers the same queries without scanning SQLite rows
+        return store.run(name, filters, **extra_params)
+    if connections is not None and location in connections:
+        return query_builder.run(connections[location], name, filters, **extra_params).fetchall()
+    with analytics_connections(location) as owned:
+        return query_builder.run(owned[location], name, filters, **extra_params).fetchall()
+
+def merge_shard_frames(frames, key, columns):
+    # Combine per-location aggregates by summing the counts for each key
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    if len(frames) == 1:
+        return frames[0]
+    return pd.concat(frames).groupby(key, as_index=False, sort=True).sum()[columns]
+
+def gather_frames(name, filters, columns, key, location=None, connections=None):
+    # Scatter a grouped query across locations and merge the counts
+    frames = router.scatter(
+        lambda loc: pd.DataFrame(run_analytics_query(name, filters, loc, connections), columns=columns),
+        location,
+    )
+    return merge_shard_frames(frames.values(), key, columns)
+
+def fetch_key_metric_parts(location, filters, connections=None):
+    # Partial aggregates for one location, mergeable across locations
+
+    # Total Reservations and guest total (for the Average Party Size)
+    row = run_analytics_query('totals', filters, location, connections)[0]
+    total_reservations = row[0] if row[0] is not None else 0
+    guest_sum = row[1] if row[1] is not None else 0
+
+    # Reservations per day (Most Busy Day) and per time (Peak Hour)
+    by_date = Counter(dict(run_analytics_query('by_date', filters.without(guests=True), location, connections)))
+    by_time = Counter(dict(run_analytics_query('by_time', filters.without(guests=True), location, connections)))
+
+    # Reservations per section (Most Popular Section)
+    by_section = Counter(dict(run_analytics_query(
+        'by_section', filters.without(section=True, guests=True), location, connections
+    )))
+
+    return {
+        'total_reservations': total_reservations,
+        'guest_sum': guest_sum,
+        'by_date': by_date,
+        'by_time': by_time,
+        'by_section': by_section,
+    }
+
+@profiler.track
+def fetch_key_metrics(filters, location=None, connections=None):
+    try:
+        parts = router.scatter(lambda loc: fetch_key_metric_parts(loc, filters, connections), location).values()
+
+        total_reservations = sum(part['total_reservations'] for part in parts)
+        guest_sum = sum(part['guest_sum'] for part in parts)
+        avg_party_size = round(guest_sum / total_reservations, 1) if total_reservations else 0.0
 
-        # Execute the Total Reservations query
-        result = execute_prepared_statement(base_query, params)
-        row = result.fetchone()
-        total_reservations = row[0] if row and row[0] is not None else 0
-
-        # Average Party Size
-        avg_party_size_query = """
-        SELECT AVG(r.guest_count) AS avg_party_size
-        FROM reservations r
-        LEFT JOIN tables t ON r.table_id = t.id
-        LEFT JOIN sections s ON t.section_id = s.id
-        WHERE r.date BETWEEN :start_date AND :end_date
-        AND r.status = 'confirmed'
-        """
-        if selected_section != "All Sections":
-            avg_party_size_query += " AND s.name = :selected_section"
-        avg_party_size_query += " AND r.guest_count BETWEEN :min_guest_count AND :max_guest_count"
-
-        result = execute_prepared_statement(avg_party_size_query, params)
-        row = result.fetchone()
-        avg_party_size = round(row[0], 1) if row and row[0] is not None else 0.0
-
-        # Most Busy Day
-        most_busy_day_query = """
-        SELECT r.date
-        FROM reservations r
-        LEFT JOIN tables t ON r.table_id = t.id
-        LEFT JOIN sections s ON t.section_id = s.id
-        WHERE r.date BETWEEN :start_date AND :end_date
-        AND r.status = 'confirmed'
-        """
-        if selected_section != "All Sections":
-            most_busy_day_query += " AND s.name = :selected_section"
-        most_busy_day_query += """
-        GROUP BY r.date
-        ORDER BY COUNT(r.id) DESC
-        LIMIT 1
-        """
-
-        result = execute_prepared_statement(most_busy_day_query, params)
-        most_busy_day = result.fetchone()
-        most_busy_day = most_busy_day[0] if most_busy_day else "N/A"
-
-        # Peak Hour
-        peak_hour_query = """
-        SELECT r.time
-        FROM reservations r
-        LEFT JOIN tables t ON r.table_id = t.id
-        LEFT JOIN sections s ON t.section_id = s.id
-        WHERE r.date BETWEEN :start_date AND :end_date
-        AND r.status = 'confirmed'
-        """
-        if selected_section != "All Sections":
-            peak_hour_query += " AND s.name = :selected_section"
-        peak_hour_query += """
-        GROUP BY r.time
-        ORDER BY COUNT(r.time) DESC
-        LIMIT 1
-        """
-
-        result = execute_prepared_statement(peak_hour_query, params)
-        peak_hour = result.fetchone()
-        peak_hour = peak_hour[0] if peak_hour else "N/A"
-
-        # Most Popular Section
-        most_popular_section_query = """
-        SELECT s.name
-        FROM reservations r
-        LEFT JOIN tables t ON r.table_id = t.id
-        LEFT JOIN sections s ON t.section_id = s.id
-        WHERE r.date BETWEEN :start_date AND :end_date
-        AND r.status = 'confirmed'
-        """
-        most_popular_section_query += """
-        GROUP BY s.name
-        ORDER BY COUNT(r.id) DESC
-        LIMIT 1
-        """
-
-        result = execute_prepared_statement(most_popular_section_query, params)
-        most_popular_section = result.fetchone()
-        most_popular_section = most_popular_section[0] if most_popular_section else "N/A"
+        def most_common(key):
+            merged = sum((part[key] for part in parts), Counter())
+            return str(merged.most_common(1)[0][0]) if merged else "N/A"
 
         return {
             'total_reservations': total_reservations,
             'avg_party_size': avg_party_size,
-            'most_busy_day': most_busy_day,
-            'peak_hour': peak_hour,
-            'most_popular_section': most_popular_section,
+            'most_busy_day': most_common('by_date'),
+            'peak_hour': most_common('by_time'),
+            'most_popular_section': most_common('by_section'),
         }
 
     except Exception as e:
@@ -400,151 +876,225 @@ def fetch_key_metrics(start_date, end_date, selected_section, min_guest_count, m
         }
 
 
-
-
 # Function to fetch daily reservations
-def get_daily_reservations(start_date, end_date, selected_section, min_guest_count, max_guest_count):
-    session = SessionLocal()
+@profiler.track
+def get_daily_reservations(filters, location=None, connections=None):
     try:
-        base_query = """
-        SELECT r.date AS Date, COUNT(r.id) AS Reservations
-        FROM reservations r
-        LEFT JOIN tables t ON r.table_id = t.id
-        LEFT JOIN sections s ON t.section_id = s.id
-        WHERE r.date BETWEEN :start_date AND :end_date
-        AND r.status = 'confirmed'
-        """
-
-        # Add filters for section and guest count
-        filters = []
-        if selected_section != "All Sections":
-            filters.append("s.name = :selected_section")
-        filters.append("r.guest_count BETWEEN :min_guest_count AND :max_guest_count")
-        if filters:
-            base_query += " AND " + " AND ".join(filters)
-
-        base_query += " GROUP BY r.date ORDER BY r.date"
-
-        params = {
-            'start_date': start_date,
-            'end_date': end_date,
-            'selected_section': selected_section,
-            'min_guest_count': min_guest_count,
-            'max_guest_count': max_guest_count,
-        }
-
-        result = execute_prepared_statement(base_query, params)
-        daily_counts = result.fetchall()
-
-        # Convert to DataFrame
-        daily_data = pd.DataFrame(daily_counts, columns=['Date', 'Reservations'])
+        daily_data = gather_frames('daily', filters, ['Date', 'Reservations'], 'Date', location, connections)
         daily_data['Date'] = pd.to_datetime(daily_data['Date'])
         return daily_data
     except Exception as e:
         st.error(f"Error fetching daily reservations: {str(e)}")
         return pd.DataFrame(columns=['Date', 'Reservations'])
-    finally:
-        session.close()
 
 
+@profiler.track
+def get_party_size_distribution(filters, location=None, connections=None):
+    try:
+        return gather_frames('party_size', filters, ['Party_Size', 'Count'], 'Party_Size', location, connections)
+    except Exception as e:
+        st.error(f"Error fetching party size distribution: {str(e)}")
+        return pd.DataFrame(columns=['Party_Size', 'Count'])
 
-def get_party_size_distribution(start_date, end_date, selected_section, min_guest_count, max_guest_count):
-    session = SessionLocal()
+
+# Function to fetch reservation counts per section
+@profiler.track
+def get_section_reservations(filters, location=None, connections=None):
     try:
-        base_query = """
-        SELECT
-            CASE
-                WHEN r.guest_count BETWEEN 1 AND 2 THEN '1-2 guests'
-                WHEN r.guest_count BETWEEN 3 AND 4 THEN '3-4 guests'
-                WHEN r.guest_count BETWEEN 5 AND 6 THEN '5-6 guests'
-                ELSE '7+ guests'
-            END AS Party_Size,
-            COUNT(r.id) AS Count
-        FROM reservations r
-        LEFT JOIN tables t ON r.table_id = t.id
-        LEFT JOIN sections s ON t.section_id = s.id
-        WHERE r.date BETWEEN :start_date AND :end_date
-        AND r.status = 'confirmed'
-        """
-
-        # Add filters for section and guest count
-        filters = []
-        if selected_section != "All Sections":
-            filters.append("s.name = :selected_section")
-        filters.append("r.guest_count BETWEEN :min_guest_count AND :max_guest_count")
-        if filters:
-            base_query += " AND " + " AND ".join(filters)
-
-        base_query += " GROUP BY Party_Size"
-
-        params = {
-            'start_date': start_date,
-            'end_date': end_date,
-            'selected_section': selected_section,
-            'min_guest_count': min_guest_count,
-            'max_guest_count': max_guest_count,
-        }
+        return gather_frames(
+            'section_reservations', filters, ['Section', 'Reservations'], 'Section', location, connections
+        )
+    except Exception as e:
+        st.error(f"Error fetching section reservations: {str(e)}")
+        return pd.DataFrame(columns=['Section', 'Reservations'])
+
+
+RESERVATION_ROW_COLUMNS = ['table_id', 'date', 'time', 'duration', 'guest_count']
 
-        result = execute_prepared_statement(base_query, params)
-        party_size_counts = result.fetchall()
 
-        # Convert to DataFrame
-        party_sizes = pd.DataFrame(party_size_counts, columns=['Party_Size', 'Count'])
-        return party_sizes
+def reservation_frame(rows, location):
+    # Integer columns even when a location has no rows, so the concatenated
+    # frame is never object dtype; reservations without a table get -1
+    frame = pd.DataFrame(rows, columns=RESERVATION_ROW_COLUMNS).fillna({'table_id': -1}).astype('int64')
+    frame['location'] = location
+    return frame
+
+
+@profiler.track
+def get_reservation_rows(filters, location=None, connections=None):
+    # Raw (table, date, time, duration, guests) rows, tagged with their location
+    def fetch(loc):
+        return reservation_frame(
+            run_analytics_query('reservation_rows', filters, loc, connections, default_duration=DEFAULT_DURATION),
+            loc,
+        )
+
+    return pd.concat(list(router.scatter(fetch, location).values()), ignore_index=True)
+
+
+# Function to fetch the weekday x time-slot occupancy heatmap
+@profiler.track
+def get_occupancy_heatmap(filters, location=None, connections=None, slot_minutes=60):
+    try:
+        def fetch(loc):
+            # (date, time, duration, count) rows; the columnar store answers
+            # whole months from its rollup, one row per combination
+            store = covering_store(filters, loc)
+            if store is not None:
+                return store.heatmap_rows(filters)
+            return get_reservation_rows(filters, loc, connections)[['date', 'time', 'duration']].assign(count=1)
+
+        rows = pd.concat(list(router.scatter(fetch, location).values()), ignore_index=True)
+
+        # Average reservations in progress per weekday and slot
+        return occupancy_heatmap(
+            rows['date'], rows['time'], rows['duration'],
+            slot_minutes=slot_minutes, start_date=filters.start_date, end_date=filters.end_date,
+            row_counts=rows['count'],
+        )
     except Exception as e:
-        st.error(f"Error fetching party size distribution: {str(e)}")
-        return pd.DataFrame(columns=['Party_Size', 'Count'])
-    finally:
-        session.close()
+        st.error(f"Error fetching occupancy heatmap: {str(e)}")
+        return occupancy_heatmap([], [], [], slot_minutes=slot_minutes)
 
 
-# Function to fetch section utilization
-def get_section_utilization(start_date, end_date, selected_section, min_guest_count, max_guest_count):
-    session = SessionLocal()
+# Function to fetch seat-hour utilization per section, table and service period
+@profiler.track
+def get_seat_hour_utilization(filters, location=None, connections=None):
     try:
-        base_query = """
-        SELECT s.name AS Section, COUNT(r.id) AS Utilization
-        FROM reservations r
-        LEFT JOIN tables t ON r.table_id = t.id
-        LEFT JOIN sections s ON t.section_id = s.id
-        WHERE r.date BETWEEN :start_date AND :end_date
-        AND r.status = 'confirmed'
-        """
-
-        # Add filters for guest count
-        filters = []
-        if selected_section != "All Sections":
-            filters.append("s.name = :selected_section")
-        filters.append("r.guest_count BETWEEN :min_guest_count AND :max_guest_count")
-        if filters:
-            base_query += " AND " + " AND ".join(filters)
-
-        base_query += " GROUP BY s.name"
-
-        params = {
-            'start_date': start_date,
-            'end_date': end_date,
-            'selected_section': selected_section,
-            'min_guest_count': min_guest_count,
-            'max_guest_count': max_guest_count,
-        }
+        def fetch_rows(loc):
+            # (reservation rows, daily rollup); the columnar store's rollup
+            # stands in for the rows whenever the filters allow
+            store = covering_store(filters, loc)
+            rollup = store.utilization_rollup(filters) if store is not None else None
+            if rollup is not None:
+                return reservation_frame([], loc), rollup.assign(table_key=loc + ':' + rollup['table_id'].astype(str))
+            return get_reservation_rows(filters, loc, connections), None
+
+        fetched = router.scatter(fetch_rows, location)
+        reservations = pd.concat([rows for rows, _ in fetched.values()], ignore_index=True)
+        rollups = [rollup for _, rollup in fetched.values() if rollup is not None]
+        has_section = filters.shape[0]
+        multiple_locations = len(router.resolve(location)) > 1
+
+        def fetch_tables(loc):
+            statement = query_builder.tables_statement(has_section)
+            if connections is not None and loc in connections:
+                rows = connections[loc].execute(statement, filters.params()).fetchall()
+            else:
+                with analytics_connections(loc) as owned:
+                    rows = owned[loc].execute(statement, filters.params()).fetchall()
+            tables = pd.DataFrame(rows, columns=['table_id', 'number', 'section', 'capacity'])
+            # Table ids are only unique within a location
+            tables['table_key'] = loc + ':' + tables['table_id'].astype(str)
+            tables['table'] = 'Table ' + tables['number'].astype(str)
+            if multiple_locations:
+                tables['table'] = loc + ' / ' + tables['table']
+            return tables
+
+        tables = pd.concat(list(router.scatter(fetch_tables, location).values()), ignore_index=True)
+        reservations['table_key'] = reservations['location'] + ':' + reservations['table_id'].astype(str)
+        return seat_hour_utilization(
+            reservations, tables, filters.start_date, filters.end_date,
+            rollup=pd.concat(rollups, ignore_index=True) if rollups else None,
+        )
+    except Exception as e:
+        st.error(f"Error fetching seat-hour utilization: {str(e)}")
+        return None
 
-        result = execute_prepared_statement(base_query, params)
-        section_counts = result.fetchall()
 
-        # Convert to DataFrame
-        section_data = pd.DataFrame(section_counts, columns=['Section', 'Utilization'])
-        return section_data
+@profiler.track
+def get_demand_outlook(location=None):
+    try:
+        return forecasts.outlook(location)
     except Exception as e:
-        st.error(f"Error fetching section utilization: {str(e)}")
-        return pd.DataFrame(columns=['Section', 'Utilization'])
-    finally:
-        session.close()
+        st.error(f"Error forecasting demand: {str(e)}")
+        return None
 
 
+# Report queries available for export, filtered like the analytics page
+EXPORT_REPORTS = {
+    'Reservations': """
+    SELECT
+        r.id AS id,
+        {date} AS date,
+        {time} AS time,
+        r.duration AS duration,
+        r.guest_count AS guest_count,
+        {status} AS status,
+        c.name AS customer_name,
+        c.email AS customer_email,
+        c.phone AS phone,
+        t.number AS table_number,
+        s.name AS section
+    FROM reservations r
+    JOIN customers c ON r.customer_id = c.id
+    LEFT JOIN tables t ON r.table_id = t.id
+    LEFT JOIN sections s ON t.section_id = s.id
+    WHERE r.date BETWEEN :start_date AND :end_date
+    AND r.guest_count BETWEEN :min_guest_count AND :max_guest_count
+    AND (:selected_section = 'All Sections' OR s.name = :selected_section)
+    ORDER BY r.date, r.time
+    """,
+    'Daily Breakdown': """
+    SELECT
+        {date} AS date,
+        s.name AS section,
+        COUNT(r.id) AS reservations,
+        SUM(r.guest_count) AS guests
+    FROM reservations r
+    LEFT JOIN tables t ON r.table_id = t.id
+    LEFT JOIN sections s ON t.section_id = s.id
+    WHERE r.date BETWEEN :start_date AND :end_date
+    AND r.status IN ({booked})
+    AND r.guest_count BETWEEN :min_guest_count AND :max_guest_count
+    AND (:selected_section = 'All Sections' OR s.name = :selected_section)
+    GROUP BY r.date, s.name
+    ORDER BY r.date, s.name
+    """,
+}
+# Decode the integer columns in the exported files
+EXPORT_REPORTS = {
+    report: query.format(
+        date=date_sql('r.date'), time=time_sql('r.time'), status=status_sql('r.status'),
+        booked=f"{STATUS_CODES['confirmed']}, {STATUS_CODES['completed']}",
+    )
+    for report, query in EXPORT_REPORTS.items()
+}
+# Parquet column types per report; LEFT JOIN columns can be all NULL
+EXPORT_COLUMN_TYPES = {
+    'Reservations': {
+        'id': 'int64', 'date': 'string', 'time': 'string', 'duration': 'int64', 'guest_count': 'int64',
+        'status': 'string', 'customer_name': 'string', 'customer_email': 'string', 'phone': 'string',
+        'table_number': 'int64', 'section': 'string',
+    },
+    'Daily Breakdown': {'date': 'string', 'section': 'string', 'reservations': 'int64', 'guests': 'int64'},
+}
+
+@profiler.track
+def export_analytics_report(report, export_format, start_date, end_date, selected_section, min_guest_count, max_guest_count, location=None):
+    # Stream from the analytics snapshots so large exports never lock bookings
+    sources = []
+    for loc in router.resolve(location):
+        snapshot = snapshots.get(loc)
+        snapshot.ensure_fresh()
+        sources.append((loc, snapshot.engine()))
+
+    params = {
+        'start_date': day_number(start_date),
+        'end_date': day_number(end_date),
+        'selected_section': selected_section,
+        'min_guest_count': min_guest_count,
+        'max_guest_count': max_guest_count,
+    }
+    name = report.lower().replace(' ', '_')
+    return export_report(
+        sources, EXPORT_REPORTS[report], params, EXPORT_FORMATS[export_format],
+        os.path.join(DATA_DIR, EXPORT_DIR), name, EXPORT_COLUMN_TYPES[report],
+    )
+
 
 # Main function to display analytics
-def show_analytics_page():
+def show_analytics_page(location=None):
     st.title("Reservation Analytics")
 
     # Expandable filters section
@@ -561,47 +1111,182 @@ def show_analytics_page():
         sections = ["All Sections", "Main Floor", "Patio", "Private Room"]
         selected_section = st.selectbox("Select Section", sections)
 
-    # Fetch key metrics with the applied filters
-    metrics = fetch_key_metrics(start_date, end_date, selected_section, min_guest_count, max_guest_count)
+        # Analytics can scatter-gather across every location
+        locations = [ALL_LOCATIONS] + router.locations()
+        location = st.selectbox(
+            "Select Location",
+            locations,
+            index=locations.index(location) if location in locations else 0,
+        )
 
-    # Display key metrics
-    st.subheader("Key Metrics")
-    col1, col2, col3 = st.columns(3)
-    with col1:
-        st.metric("Total Reservations", metrics['total_reservations'])
-        st.metric("Average Party Size", f"{metrics['avg_party_size']:.1f} guests")
+    # Analytics run on a snapshot, so show how current it is
+    col1, col2 = st.columns([3, 1])
     with col2:
-        st.metric("Peak Hour", metrics['peak_hour'])
-        st.metric("Most Popular Section", metrics['most_popular_section'])
-    with col3:
-        st.metric("Most Busy day", metrics['most_busy_day'])
+        if st.button("↻ Refresh Data"):
+            snapshots.refresh(location)
+            if columnar_stores is not None:
+                columnar_stores.refresh(location)
+
+    filters = AnalyticsFilter(start_date, end_date, selected_section, min_guest_count, max_guest_count)
+
+    # Every query below shares one snapshot connection per location
+    with analytics_connections(location) as connections:
+        if columnar_stores is not None:
+            # Build a missing store before reading its timestamp
+            columnar_stores.ensure_built(location)
+        data_as_of = (columnar_stores or snapshots).data_as_of(location)
+        with col1:
+            if data_as_of is not None:
+                st.caption(f"Data as of {data_as_of:%Y-%m-%d %H:%M:%S}")
 
-    # Daily Reservations Chart
-    daily_data = get_daily_reservations(start_date, end_date, selected_section, min_guest_count, max_guest_count)
-    st.subheader("Reservation Trends")
-    tab1, tab2 = st.tabs(["Daily Reservations", "Party Size Distribution"])
-    daily_data['Reservations'] += np.random.uniform(-0.2, 0.2, size=len(daily_data))
+        # Fetch key metrics with the applied filters
+        metrics = fetch_key_metrics(filters, location, connections)
 
-    # Daily Reservations Chart
-    with tab1:
-        st.line_chart(daily_data.set_index('Date')['Reservations'])
+        # Display key metrics
+        st.subheader("Key Metrics")
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Total Reservations", metrics['total_reservations'])
+            st.metric("Average Party Size", f"{metrics['avg_party_size']:.1f} guests")
+        with col2:
+            st.metric("Peak Hour", metrics['peak_hour'])
+            st.metric("Most Popular Section", metrics['most_popular_section'])
+        with col3:
+            st.metric("Most Busy day", metrics['most_busy_day'])
+
+        # Daily Reservations Chart
+        daily_data = get_daily_reservations(filters, location, connections)
+        st.subheader("Reservation Trends")
+        tab1, tab2 = st.tabs(["Daily Reservations", "Party Size Distribution"])
+        daily_data['Reservations'] += np.random.uniform(-0.2, 0.2, size=len(daily_data))
+
+        # Daily Reservations Chart
+        with tab1:
+            st.line_chart(daily_data.set_index('Date')['Reservations'])
+
+        # Party Size Distribution Chart
+        party_sizes = get_party_size_distribution(filters, location, connections)
+        with tab2:
+            st.bar_chart(party_sizes.set_index('Party_Size'))
+
+        # Reservations by Section Chart
+        section_data = get_section_reservations(filters, location, connections)
+        st.subheader("Reservations by Section")
+        st.bar_chart(section_data.set_index('Section'))
+
+        # Section Utilization: seat-hours booked vs. seat-hours available
+        utilization = get_seat_hour_utilization(filters, location, connections)
+        st.subheader("Section Utilization")
+        if utilization is not None:
+            percent_columns = {'utilization': 'Utilization %', 'occupancy': 'Table Occupancy %'}
+            tab1, tab2, tab3 = st.tabs(["By Section", "By Service Period", "By Table"])
+            for tab, key, label in [(tab1, 'section', 'section'), (tab2, 'period', 'period')]:
+                with tab:
+                    chart_data = utilization[key].set_index(label)[list(percent_columns)] * 100
+                    st.bar_chart(chart_data.rename(columns=percent_columns), stack=False)
+            with tab3:
+                table_data = utilization['table'].copy()
+                table_data[list(percent_columns)] = table_data[list(percent_columns)] * 100
+                st.dataframe(
+                    table_data.rename(columns=percent_columns).round(1),
+                    use_container_width=True,
+                    hide_index=True,
+                )
 
-    # Party Size Distribution Chart
-    party_sizes = get_party_size_distribution(start_date, end_date, selected_section, min_guest_count, max_guest_count)
-    with tab2:
-        st.bar_chart(party_sizes.set_index('Party_Size'))
+        # Occupancy Heatmap
+        st.subheader("Occupancy Heatmap")
+        slot_minutes = st.radio("Slot Size", [60, 15], format_func=lambda m: f"{m} minutes", horizontal=True)
+        heatmap = get_occupancy_heatmap(filters, location, connections, slot_minutes)
+        heatmap_data = heatmap.rename_axis('Weekday').reset_index().melt(
+            id_vars='Weekday', var_name='Slot', value_name='Occupancy'
+        )
+        st.altair_chart(
+            alt.Chart(heatmap_data).mark_rect().encode(
+                x=alt.X('Slot:O', sort=list(heatmap.columns)),
+                y=alt.Y('Weekday:O', sort=list(heatmap.index)),
+                color=alt.Color('Occupancy:Q', title='Avg. reservations'),
+                tooltip=['Weekday', 'Slot', alt.Tooltip('Occupancy:Q', format='.2f')],
+            ),
+            use_container_width=True,
+        )
 
-    # Section Utilization Chart
-    section_data = get_section_utilization(start_date, end_date, selected_section, min_guest_count, max_guest_count)
-    st.subheader("Section Utilization")
-    st.bar_chart(section_data.set_index('Section'))
+    # Forecast for the coming days, from the weekday and hour booking rates
+    st.subheader("Demand Outlook")
+    outlook = get_demand_outlook(location)
+    if outlook is not None and not outlook.empty:
+        chart_data = outlook.groupby('Date')[['On Books', 'Forecast Bookings']].sum()
+        st.bar_chart(chart_data, stack=False)
+        st.dataframe(outlook, hide_index=True, use_container_width=True)
+        st.caption("Cancellation % is the expected share of bookings cancelled; no-shows are not recorded separately.")
+
+    # Export
+    st.subheader("Export")
+    col1, col2, col3 = st.columns([2, 1, 1])
+    with col1:
+        report = st.selectbox("Report", list(EXPORT_REPORTS))
+    with col2:
+        export_format = st.selectbox("Format", list(EXPORT_FORMATS))
+    with col3:
+        st.write("")
+        prepare_export = st.button("Prepare Export")
+
+    if prepare_export:
+        try:
+            st.session_state.export_file = export_analytics_report(
+                report, export_format, start_date, end_date,
+                selected_section, min_guest_count, max_guest_count, location,
+            )
+        except Exception as e:
+            st.error(f"Error exporting report: {str(e)}")
+
+    if st.session_state.get('export_file'):
+        export_path, row_count = st.session_state.export_file
+        if os.path.exists(export_path):
+            extension = export_path.rsplit('.', 1)[-1]
+            st.download_button(
+                f"Download {os.path.basename(export_path)} ({row_count} rows)",
+                data=read_export(export_path),
+                file_name=os.path.basename(export_path),
+                mime=MIME_TYPES[extension],
+            )
+        else:
+            # Removed by the prune_exports job
+            st.session_state.export_file = None
 
 def main():
     st.title("Restaurant Reservation System")
     
+    # Pick the location; each location has its own database
+    with st.sidebar:
+        location = st.selectbox("Location", router.locations())
+        with st.expander("Add Location"):
+            new_location = st.text_input("Location Name")
+            if st.button("Add Location") and new_location:
+                try:
+                    router.add_location(new_location)
+                    init_db(new_location.strip())
+                    st.rerun()
+                except ValueError as e:
+                    st.error(str(e))
+    
     # Initialize database if needed
-    if not os.path.exists(DB_PATH):
-        init_db()
+    if not os.path.exists(router.path_for(location)):
+        init_db(location)
+    ensure_schema(location)
+    
+    # Maintenance runs in the background, off the request path
+    scheduler = get_scheduler()
+    
+    # Cached state from another location is stale
+    if st.session_state.get('location') != location:
+        st.session_state.location = location
+        st.session_state.reservation_state = 'entering_details'
+        st.session_state.available_tables = None
+        st.session_state.selected_table = None
+        st.session_state.held_table = None
+        st.session_state.reservations_page = 0
+        st.session_state.pop('editing_reservation_id', None)
+        st.session_state.pop('edit_state', None)
     
     tab1, tab2, tab3 = st.tabs(["Make Reservation", "View Reservations", "Analytics Report"])
     
@@ -611,6 +1296,9 @@ def main():
             st.session_state.reservation_state = 'entering_details'
             st.session_state.available_tables = None
             st.session_state.selected_table = None
+        if 'hold_token' not in st.session_state:
+            # Identifies this session's table holds
+            st.session_state.hold_token = uuid.uuid4().hex
 
         if st.session_state.reservation_state == 'entering_details':
             with st.form("reservation_form"):
@@ -630,15 +1318,67 @@ def main():
                 with col4:
                     time = st.time_input("Time")
 
+                col5, col6, col7 = st.columns(3)
+                with col5:
+                    repeat = st.selectbox("Repeat", ["Does not repeat"] + list(REPEAT_OPTIONS))
+                with col6:
+                    repeat_until = st.date_input("Repeat Until", value=datetime.today() + timedelta(weeks=12),
+                                                 min_value=datetime.today())
+                with col7:
+                    skip_dates = st.text_input("Skip Dates", placeholder="YYYY-MM-DD, YYYY-MM-DD")
+
                 check_availability = st.form_submit_button("Check Availability")
 
                 if check_availability:
                     if not all([customer_name, customer_email, customer_phone]):
                         st.error("Please fill in all customer details.")
+                    elif repeat != "Does not repeat":
+                        frequency, interval = REPEAT_OPTIONS[repeat]
+                        try:
+                            exceptions = parse_exceptions(skip_dates)
+                        except ValueError:
+                            st.error("Skip dates must be YYYY-MM-DD, separated by commas.")
+                            st.stop()
+                        series_data = {
+                            'start_date': date,
+                            'until': repeat_until,
+                            'time': time,
+                            'frequency': frequency,
+                            'interval': interval,
+                            'exceptions': exceptions,
+                        }
+                        try:
+                            occurrences, candidates = get_series_availability(series_data, guest_count, location)
+                        except ValueError as e:
+                            st.error(str(e))
+                            st.stop()
+                        if candidates:
+                            st.session_state.available_tables = table_slots(table for table, _ in candidates)
+                            # Only conflict counts per table are kept in the session
+                            st.session_state.series_conflicts = {table.id: len(dates) for table, dates in candidates}
+                            st.session_state.reservation_details = {
+                                'customer_name': customer_name,
+                                'customer_email': customer_email,
+                                'customer_phone': customer_phone,
+                                'date': date,
+                                'time': time,
+                                'guest_count': guest_count,
+                                'repeat': repeat,
+                                'series': series_data,
+                                'occurrences': len(occurrences),
+                            }
+                            st.session_state.reservation_state = 'selecting_table'
+                            st.rerun()
+                        elif not occurrences:
+                            st.error("The series has no dates before the end date.")
+                        else:
+                            st.error("No table is available for any date of this series.")
                     else:
-                        available_tables = get_available_tables(date, time, guest_count)
+                        available_tables = get_available_tables(date, time, guest_count, location,
+                                                                st.session_state.hold_token)
                         if available_tables:
-                            st.session_state.available_tables = available_tables
+                            st.session_state.available_tables = table_slots(available_tables)
+                            st.session_state.held_table = None
                             st.session_state.reservation_details = {
                                 'customer_name': customer_name,
                                 'customer_email': customer_email,
@@ -665,16 +1405,64 @@ def main():
                 st.write(f"Date: {details['date']}")
                 st.write(f"Time: {details['time']}")
                 st.write(f"Guests: {details['guest_count']}")
-
-            # Table selection form
-            with st.form("table_selection_form"):
+            series_data = details.get('series')
+            if series_data:
+                st.write(f"Repeats: {details['repeat']} until {series_data['until']} "
+                         f"({details['occurrences']} dates)")
+
+            # Table selection; outside the form so every pick places a hold
+            if series_data:
+                conflicts = st.session_state.series_conflicts
+                table_options = {
+                    f"Table {t.number} (Capacity: {t.capacity})"
+                    + (f" - unavailable on {conflicts[t.id]} dates" if conflicts.get(t.id) else ""): t.id
+                    for t in st.session_state.available_tables
+                }
+            else:
                 table_options = {f"Table {t.number} (Capacity: {t.capacity})": t.id 
                                for t in st.session_state.available_tables}
-                selected_table = st.selectbox("Select Table", options=list(table_options.keys()))
-                
+            selected_table = st.selectbox("Select Table", options=list(table_options.keys()))
+
+            if not series_data and st.session_state.get('held_table') != table_options[selected_table]:
+                # Hold the picked table so another host cannot take it before confirmation
+                if hold_table(st.session_state.hold_token, table_options[selected_table],
+                              details['date'], details['time'], location):
+                    st.session_state.held_table = table_options[selected_table]
+                else:
+                    st.session_state.available_tables = [
+                        t for t in st.session_state.available_tables if t.id != table_options[selected_table]
+                    ]
+                    st.session_state.held_table = None
+                    if not st.session_state.available_tables:
+                        st.session_state.reservation_state = 'entering_details'
+                    st.warning(f"{selected_table} was just taken by another host. Please choose another table.")
+            if not series_data and st.session_state.held_table:
+                st.caption(f"{selected_table} is held for you for {inventory.HOLD_SECONDS // 60} minutes.")
+
+            with st.form("table_selection_form"):
                 confirm_reservation = st.form_submit_button("Confirm Reservation")
                 
-                if confirm_reservation:
+                if confirm_reservation and series_data:
+                    # Dates where the table is taken are skipped and recorded on the series
+                    success, message = create_reservation_series(
+                        customer_data={
+                            'name': details['customer_name'],
+                            'email': details['customer_email'],
+                            'phone': details['customer_phone']
+                        },
+                        series_data=dict(series_data, table_id=table_options[selected_table],
+                                         guest_count=details['guest_count']),
+                        location=location
+                    )
+                    if success:
+                        st.success(message)
+                        st.session_state.reservation_state = 'entering_details'
+                        st.session_state.available_tables = None
+                        st.session_state.pop('series_conflicts', None)
+                        st.rerun()
+                    else:
+                        st.error(f"Error: {message}")
+                elif confirm_reservation:
                     table_id = table_options[selected_table]
                     success, message = create_reservation(
                         customer_data={
@@ -687,19 +1475,24 @@ def main():
                             'time': details['time'],
                             'table_id': table_id,
                             'guest_count': details['guest_count']
-                        }
+                        },
+                        location=location,
+                        hold_token=st.session_state.hold_token
                     )
                     if success:
                         st.success(message)
                         # Reset the reservation state
                         st.session_state.reservation_state = 'entering_details'
                         st.session_state.available_tables = None
+                        st.session_state.held_table = None
                         st.rerun()
                     else:
                         st.error(f"Error: {message}")
 
             # Add a back button outside the form
             if st.button("Back to Details"):
+                release_table_hold(st.session_state.hold_token, location)
+                st.session_state.held_table = None
                 st.session_state.reservation_state = 'entering_details'
                 st.rerun()
     
@@ -709,12 +1502,23 @@ def main():
         col1, col2 = st.columns([3, 1])
         with col1:
             if st.button("↻ Refresh"):
-                st.session_state.reservations = get_current_reservations()
+                data_changed(location)
         
-        if 'reservations' not in st.session_state:
-            st.session_state.reservations = get_current_reservations()
+        # The full list is shared across sessions; each session only keeps its page cursor
+        reservations = get_shared_reservations(location)
+        page_count = max(1, -(-len(reservations) // RESERVATIONS_PAGE_SIZE))
+        with col2:
+            page = st.number_input(
+                f"Page (of {page_count})",
+                min_value=1,
+                max_value=page_count,
+                value=min(st.session_state.get('reservations_page', 0), page_count - 1) + 1,
+            )
+        st.session_state.reservations_page = page - 1
+        page_start = st.session_state.reservations_page * RESERVATIONS_PAGE_SIZE
+        page_reservations = reservations.iloc[page_start:page_start + RESERVATIONS_PAGE_SIZE]
         
-        if not st.session_state.reservations.empty:
+        if not reservations.empty:
             # Configure column display
             column_config = {
                 "id": st.column_config.NumberColumn(
@@ -757,7 +1561,7 @@ def main():
             
             # Display dataframe with selection enabled
             event = st.dataframe(
-                st.session_state.reservations,
+                page_reservations,
                 column_config=column_config,
                 use_container_width=True,
                 hide_index=True,
@@ -768,141 +1572,161 @@ def main():
             # Handle selection
             if event.selection and event.selection.rows:
                 selected_row = event.selection.rows[0]
-                selected_reservation = st.session_state.reservations.iloc[selected_row]
+                selected_reservation = page_reservations.iloc[selected_row]
                 
                 col1, col2 = st.columns(2)
                 with col1:
                     if st.button("Edit", key="edit_button"):
                         # Initialize edit state
                         st.session_state.edit_state = 'entering_details'
-                        st.session_state.editing_reservation = selected_reservation
+                        st.session_state.editing_reservation_id = int(selected_reservation['id'])
                 with col2:
                     if st.button("Delete", key="delete_button"):
-                        success, message = delete_reservation(selected_reservation['id'])
+                        success, message = delete_reservation(int(selected_reservation['id']), location)
                         if success:
+                            if st.session_state.get('editing_reservation_id') == int(selected_reservation['id']):
+                                st.session_state.pop('editing_reservation_id', None)
+                                st.session_state.pop('edit_state', None)
                             st.success(message)
-                            st.session_state.reservations = get_current_reservations()
                             st.rerun()
                         else:
                             st.error(message)
 
-                # Show edit form when edit is clicked
-                if 'edit_state' in st.session_state:
-                    if st.session_state.edit_state == 'entering_details':
-                        with st.form(key="edit_form"):
-                            st.subheader("Edit Reservation")
+            # The edit form follows the stored id, not the table selection,
+            # which resets whenever the shared list changes
+            editing_id = st.session_state.get('editing_reservation_id')
+            editing = reservations[reservations['id'] == editing_id] if editing_id is not None else reservations.iloc[:0]
+            if editing_id is not None and editing.empty:
+                # Deleted or no longer current since editing started
+                st.session_state.pop('editing_reservation_id', None)
+                st.session_state.pop('edit_state', None)
+                st.info("The reservation being edited no longer exists.")
+            elif not editing.empty and 'edit_state' in st.session_state:
+                editing_reservation = editing.iloc[0]
+                if st.session_state.edit_state == 'entering_details':
+                    with st.form(key="edit_form"):
+                        st.subheader("Edit Reservation")
                             
-                            col1, col2 = st.columns(2)
-                            with col1:
-                                customer_name = st.text_input("Name", value=selected_reservation['customer_name'])
-                                customer_email = st.text_input("Email", value=selected_reservation['customer_email'])
-                            with col2:
-                                customer_phone = st.text_input("Phone", value=selected_reservation['phone'])
-                                guest_count = st.number_input("Number of Guests", 
-                                                            min_value=1, 
-                                                            max_value=20, 
-                                                            value=selected_reservation['guest_count'])
-
-                            st.subheader("Reservation Details")
-                            col3, col4 = st.columns(2)
-                            with col3:
-                                # Get the default date from the reservation
-                                default_date = pd.to_datetime(selected_reservation['date']).date()
-
-                                # Ensure the default date is within the allowed range
-                                min_date = datetime.today().date()
-                                if default_date < min_date:
-                                    default_date = min_date
-
-                                # Add the date input
-                                date = st.date_input(
-                                    "Date",
-                                    value=default_date,
-                                    min_value=min_date
-                                )
-                            with col4:
-                                time = st.time_input("Time", 
-                                                value=pd.to_datetime(selected_reservation['time']).time())
-
-                            check_availability = st.form_submit_button("Check Availability")
-
-                            if check_availability:
-                                if not all([customer_name, customer_email, customer_phone]):
-                                    st.error("Please fill in all customer details.")
-                                else:
-                                    available_tables = get_available_tables(date, time, guest_count)
-                                    if available_tables:
-                                        st.session_state.available_tables = available_tables
-                                        st.session_state.edit_details = {
-                                            'customer_name': customer_name,
-                                            'customer_email': customer_email,
-                                            'customer_phone': customer_phone,
-                                            'date': date,
-                                            'time': time,
-                                            'guest_count': guest_count
-                                        }
-                                        st.session_state.edit_state = 'selecting_table'
-                                        st.rerun()
-                                    else:
-                                        st.error("No tables available for this time and party size.")
-
-                    elif st.session_state.edit_state == 'selecting_table':
-                        # Display reservation details
-                        st.subheader("Edit Reservation Details")
-                        details = st.session_state.edit_details
                         col1, col2 = st.columns(2)
                         with col1:
-                            st.write(f"Name: {details['customer_name']}")
-                            st.write(f"Email: {details['customer_email']}")
-                            st.write(f"Phone: {details['customer_phone']}")
+                            customer_name = st.text_input("Name", value=editing_reservation['customer_name'])
+                            customer_email = st.text_input("Email", value=editing_reservation['customer_email'])
                         with col2:
-                            st.write(f"Date: {details['date']}")
-                            st.write(f"Time: {details['time']}")
-                            st.write(f"Guests: {details['guest_count']}")
-
-                        # Table selection form
-                        with st.form("table_selection_form"):
-                            table_options = {f"Table {t.number} (Capacity: {t.capacity})": t.id 
-                                        for t in st.session_state.available_tables}
-                            selected_table = st.selectbox("Select Table", options=list(table_options.keys()))
-                            
-                            confirm_update = st.form_submit_button("Update Reservation")  # Changed variable name
-                            
-                            if confirm_update:  # Changed variable name
-                                table_id = table_options[selected_table]
-                                update_data = {
-                                    'date': details['date'],
-                                    'time': details['time'],
-                                    'guest_count': details['guest_count'],
-                                    'table_id': table_id,
-                                    'customer_name': details['customer_name'],
-                                    'customer_email': details['customer_email'],
-                                    'customer_phone': details['customer_phone']
-                                }
-                                success, message = update_reservation(selected_reservation['id'], update_data)  # Function call remains the same
-                                if success:
-                                    st.success(message)
-                                    # Reset edit state
-                                    if 'edit_state' in st.session_state:
-                                        del st.session_state.edit_state
-                                    if 'edit_details' in st.session_state:
-                                        del st.session_state.edit_details
-                                    if 'available_tables' in st.session_state:
-                                        del st.session_state.available_tables
-                                    st.session_state.reservations = get_current_reservations()
+                            customer_phone = st.text_input("Phone", value=editing_reservation['phone'])
+                            guest_count = st.number_input("Number of Guests", 
+                                                        min_value=1, 
+                                                        max_value=20, 
+                                                        value=editing_reservation['guest_count'])
+
+                        st.subheader("Reservation Details")
+                        col3, col4 = st.columns(2)
+                        with col3:
+                            # Get the default date from the reservation
+                            default_date = pd.to_datetime(editing_reservation['date']).date()
+
+                            # Ensure the default date is within the allowed range
+                            min_date = datetime.today().date()
+                            if default_date < min_date:
+                                default_date = min_date
+
+                            # Add the date input
+                            date = st.date_input(
+                                "Date",
+                                value=default_date,
+                                min_value=min_date
+                            )
+                        with col4:
+                            time = st.time_input("Time", 
+                                            value=pd.to_datetime(editing_reservation['time']).time())
+
+                        check_availability = st.form_submit_button("Check Availability")
+
+                        if check_availability:
+                            if not all([customer_name, customer_email, customer_phone]):
+                                st.error("Please fill in all customer details.")
+                            else:
+                                available_tables = get_available_tables(date, time, guest_count, location)
+                                if available_tables:
+                                    st.session_state.available_tables = table_slots(available_tables)
+                                    st.session_state.edit_details = {
+                                        'customer_name': customer_name,
+                                        'customer_email': customer_email,
+                                        'customer_phone': customer_phone,
+                                        'date': date,
+                                        'time': time,
+                                        'guest_count': guest_count
+                                    }
+                                    st.session_state.edit_state = 'selecting_table'
                                     st.rerun()
                                 else:
-                                    st.error(message)
-
-                        # Add a back button outside the form
-                        if st.button("Back to Details"):
-                            st.session_state.edit_state = 'entering_details'
-                            st.rerun()
+                                    st.error("No tables available for this time and party size.")
+
+                elif st.session_state.edit_state == 'selecting_table':
+                    # Display reservation details
+                    st.subheader("Edit Reservation Details")
+                    details = st.session_state.edit_details
+                    col1, col2 = st.columns(2)
+                    with col1:
+                        st.write(f"Name: {details['customer_name']}")
+                        st.write(f"Email: {details['customer_email']}")
+                        st.write(f"Phone: {details['customer_phone']}")
+                    with col2:
+                        st.write(f"Date: {details['date']}")
+                        st.write(f"Time: {details['time']}")
+                        st.write(f"Guests: {details['guest_count']}")
+
+                    # Table selection form
+                    with st.form("table_selection_form"):
+                        table_options = {f"Table {t.number} (Capacity: {t.capacity})": t.id 
+                                    for t in st.session_state.available_tables}
+                        selected_table = st.selectbox("Select Table", options=list(table_options.keys()))
+                            
+                        confirm_update = st.form_submit_button("Update Reservation")  # Changed variable name
+                            
+                        if confirm_update:  # Changed variable name
+                            table_id = table_options[selected_table]
+                            update_data = {
+                                'date': details['date'],
+                                'time': details['time'],
+                                'guest_count': details['guest_count'],
+                                'table_id': table_id,
+                                'customer_name': details['customer_name'],
+                                'customer_email': details['customer_email'],
+                                'customer_phone': details['customer_phone']
+                            }
+                            success, message = update_reservation(editing_id, update_data, location)  # Function call remains the same
+                            if success:
+                                st.success(message)
+                                # Reset edit state
+                                if 'edit_state' in st.session_state:
+                                    del st.session_state.edit_state
+                                if 'edit_details' in st.session_state:
+                                    del st.session_state.edit_details
+                                if 'available_tables' in st.session_state:
+                                    del st.session_state.available_tables
+                                st.session_state.pop('editing_reservation_id', None)
+                                st.rerun()
+                            else:
+                                st.error(message)
+
+                    # Add a back button outside the form
+                    if st.button("Back to Details"):
+                        st.session_state.edit_state = 'entering_details'
+                        st.rerun()
         else:
             st.info("No current reservations found.")
     
     with tab3:
-        show_analytics_page()
+        show_analytics_page(location)
+    
+    # Track this session's state size for the memory report
+    record_session_footprint()
+    show_memory_report()
+    show_job_report(scheduler)
+    show_profiler_report()
+    show_schema_report(location)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # Sampled while profiling is enabled; a no-op otherwise
+    with profiler.rerun():
+        main()
\ No newline at end of file
@@ -0,0 +1,204 @@
+# migrations.py
+# Versioned schema migrations and the managed index set. Each database
+# records the migrations it has applied in PRAGMA user_version; upgrade()
+# runs the missing ones in one locked transaction, so existing databases are
+# upgraded in place and two processes never migrate the same file at once.
+# Indexes are declared here rather than on the models: every upgrade creates
+# missing ones, rebuilds changed ones and drops retired ones, then refreshes
+# the planner statistics. check_query_plans() runs EXPLAIN QUERY PLAN on the
+# app's own hot statements to catch any that fall back to a full scan.
+import re
+
+import pandas as pd
+from sqlalchemy import event, text
+
+from analytics import DEFAULT_DURATION
+from column_types import STATUS_CODES, LEGACY_CONVERSIONS
+
+CONFIRMED = STATUS_CODES['confirmed']
+BOOKED = f"{STATUS_CODES['confirmed']}, {STATUS_CODES['completed']}"
+
+
+def add_reservation_columns(connection, metadata):
+    # Columns added to reservations after the first databases were created
+    columns = [row[1] for row in connection.execute(text("PRAGMA table_info(reservations)"))]
+    added = [
+        ('duration', f"INTEGER DEFAULT {DEFAULT_DURATION}"),
+        ('series_id', "INTEGER REFERENCES reservation_series (id)"),
+    ]
+    for name, definition in added:
+        if name not in columns:
+            connection.execute(text(f"ALTER TABLE reservations ADD COLUMN {name} {definition}"))
+
+
+def encode_reservation_columns(connection, metadata):
+    # Rebuild reservations with integer day, minute and status columns.
+    # SQLite cannot change a column's type in place, so the table is copied.
+    declared = {row[1]: row[2] for row in connection.execute(text("PRAGMA table_info(reservations)"))}
+    if declared['date'].upper() == 'INTEGER':
+        return
+    unknown = connection.execute(text(
+        "SELECT DISTINCT status FROM reservations WHERE status IS NOT NULL AND status NOT IN ("
+        + ", ".join(f"'{name}'" for name in STATUS_CODES) + ")"
+    )).fetchall()
+    if unknown:
+        raise RuntimeError(f"Unknown reservation statuses: {', '.join(row[0] for row in unknown)}")
+
+    reservations = metadata.tables['reservations']
+    connection.execute(text("ALTER TABLE reservations RENAME TO reservations_legacy"))
+    reservations.create(connection)
+    names = [column.name for column in reservations.columns]
+    connection.execute(text(
+        f"INSERT INTO reservations ({', '.join(names)}) "
+        f"SELECT {', '.join(LEGACY_CONVERSIONS.get(name, name) for name in names)} FROM reservations_legacy"
+    ))
+    connection.execute(text("DROP TABLE reservations_legacy"))
+    # The slot inventory is derived data; extend_inventory rebuilds it
+    connection.execute(text("DROP TABLE IF EXISTS slot_inventory"))
+
+
+# Applied in order; a database at version N has run the first N. Append
+# new migrations, never edit or reorder the ones already shipped.
+MIGRATIONS = [
+    ('add_reservation_columns', add_reservation_columns),
+    ('encode_reservation_columns', encode_reservation_columns),
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+# (name, table, columns, partial-index condition)
+INDEXES = [
+    # Overlap checks and completing past bookings only look at confirmed
+    # rows, and analytics only at booked ones, so these skip everything else.
+    # The overlap checks in main.py name the first with INDEXED BY.
+    ('ix_reservations_confirmed_table_date', 'reservations', 'table_id, date, time', f"status = {CONFIRMED}"),
+    ('ix_reservations_booked_date', 'reservations', 'date', f"status IN ({BOOKED})"),
+    # Listings and exports over every status, in date and time order
+    ('ix_reservations_date_table_time', 'reservations', 'date, table_id, time', None),
+    ('ix_reservations_status_date', 'reservations', 'status, date', None),
+    # Foreign keys; most reservations are not part of a series
+    ('ix_reservations_customer_id', 'reservations', 'customer_id', None),
+    ('ix_reservations_series_id', 'reservations', 'series_id', 'series_id IS NOT NULL'),
+    ('ix_tables_section_id', 'tables', 'section_id', None),
+    ('ix_reservation_series_customer_id', 'reservation_series', 'customer_id', None),
+]
+MANAGED_TABLES = sorted({table for _, table, _, _ in INDEXES})
+
+def index_sql(name, table, columns, where):
+    return f"CREATE INDEX {name} ON {table} ({columns})" + (f" WHERE {where}" if where else '')
+
+
+def _normalized(sql):
+    return re.sub(r'\s+', ' ', sql or '').strip()
+
+
+def _schema_version(connection):
+    return connection.execute(text("PRAGMA user_version")).scalar()
+
+
+def _existing_indexes(connection):
+    # name -> (table, sql) for the named indexes on managed tables
+    rows = connection.execute(text(
+        "SELECT name, tbl_name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL"
+    )).fetchall()
+    return {name: (table, sql) for name, table, sql in rows if table in MANAGED_TABLES}
+
+
+def sync_indexes(connection):
+    # Create missing indexes, rebuild ones whose definition changed and drop
+    # retired ones; returns the names touched
+    existing = _existing_indexes(connection)
+    declared = {name for name, _, _, _ in INDEXES}
+    changed = []
+    for name in sorted(set(existing) - declared):
+        if name.startswith('ix_'):
+            connection.execute(text(f"DROP INDEX {name}"))
+            changed.append(name)
+    for name, table, columns, where in INDEXES:
+        sql = index_sql(name, table, columns, where)
+        if name in existing:
+            if _normalized(existing[name][1]) == _normalized(sql):
+                continue
+            connection.execute(text(f"DROP INDEX {name}"))
+        connection.execute(text(sql))
+        changed.append(name)
+    return changed
+
+
+def upgrade(engine, metadata):
+    # Returns (migrations applied, indexes changed)
+    with engine.connect() as connection:
+        # Explicit BEGIN IMMEDIATE: pysqlite would otherwise run the DDL
+        # outside a transaction, and the write lock makes other processes
+        # wait here instead of migrating the same file
+        connection = connection.execution_options(isolation_level="AUTOCOMMIT")
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+        try:
+            version = _schema_version(connection)
+            if version > SCHEMA_VERSION:
+                raise RuntimeError(
+                    f"Database schema version {version} is newer than this app supports ({SCHEMA_VERSION})."
+                )
+            fresh = connection.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'reservations'"
+            )).first() is None
+            # A new database is created at the current version
+            pending = [] if fresh else MIGRATIONS[version:]
+            for _, migrate in pending:
+                migrate(connection, metadata)
+            metadata.create_all(connection)
+            connection.exec_driver_sql(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            changed = sync_indexes(connection)
+            connection.exec_driver_sql("COMMIT")
+        except Exception:
+            connection.exec_driver_sql("ROLLBACK")
+            raise
+        if changed:
+            # New indexes are only chosen well once the planner has statistics
+            connection.exec_driver_sql("ANALYZE")
+    return [name for name, _ in pending], changed
+
+
+def index_report(connection):
+    existing = _existing_indexes(connection)
+    rows = []
+    for name, table, columns, where in INDEXES:
+        if name not in existing:
+            status = 'missing'
+        elif _normalized(existing[name][1]) != _normalized(index_sql(name, table, columns, where)):
+            status = 'changed'
+        else:
+            status = 'ok'
+        rows.append({'Index': name, 'Table': table, 'Columns': columns, 'Partial': where or '', 'Status': status})
+    return pd.DataFrame(rows, columns=['Index', 'Table', 'Columns', 'Partial', 'Status'])
+
+
+def explain(connection, statement, params=None):
+    # EXPLAIN QUERY PLAN of a statement exactly as the app runs it: compiled
+    # and bound the same way, with the prefix added just before the cursor
+    # executes it (so an UPDATE is planned, not applied)
+    def prefix(conn, cursor, sql, parameters, context, executemany):
+        return f"EXPLAIN QUERY PLAN {sql}", parameters
+
+    event.listen(connection, 'before_cursor_execute', prefix, retval=True)
+    try:
+        result = connection.execute(statement, params or {})
+        return [row[3] for row in result.cursor.fetchall()]
+    finally:
+        event.remove(connection, 'before_cursor_execute', prefix)
+
+
+def check_query_plans(connection, queries):
+    # Plan every hot query; queries holds (name, table as named in the plan,
+    # statement, params, indexes any of which the plan must use). 'Full scan'
+    # marks a query that reads its whole driving table (small joined tables
+    # may be scanned), 'Indexed' whether one of the expected indexes is used
+    rows = []
+    for name, table, statement, params, indexes in queries:
+        plan = explain(connection, statement, params)
+        rows.append({
+            'Query': name,
+            'Plan': ' | '.join(plan),
+            'Full scan': any(detail.split()[:2] == ['SCAN', table] for detail in plan),
+            'Indexed': any(index in detail for detail in plan for index in indexes),
+        })
+    return pd.DataFrame(rows, columns=['Query', 'Plan', 'Full scan', 'Indexed'])
@@ -0,0 +1,179 @@
+# profiling.py
+# Opt-in sampling profiler for Streamlit reruns. While enabled, a background
+# thread samples the Python stack of every thread inside a rerun at a fixed
+# interval. Samples are aggregated across reruns into hotspots and can be
+# exported as collapsed stacks for flamegraph tools (flamegraph.pl,
+# speedscope, inferno). Tracked functions also record call counts and wall time.
+import functools
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+import pandas as pd
+
+# Seconds between stack samples
+SAMPLE_INTERVAL = float(os.environ.get('RESTAURANT_PROFILE_INTERVAL', 0.005))
+# Frames deeper than this are cut from the root end of the stack
+MAX_DEPTH = 128
+
+
+def frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class Profiler:
+    """Process-wide sampling profiler; every session's reruns are aggregated."""
+
+    def __init__(self, root_dir, interval=SAMPLE_INTERVAL, enabled=False):
+        # Stacks start at the first frame from root_dir, dropping Streamlit's runner
+        self.root_dir = os.path.abspath(root_dir)
+        self.interval = interval
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        # thread id -> rerun label, for threads currently being sampled
+        self._active = {}
+        self._sampler = None
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.stacks = Counter()
+            self.samples = 0
+            self.reruns = 0
+            self.rerun_seconds = 0.0
+            # function name -> [calls, total seconds, max seconds]
+            self.functions = defaultdict(lambda: [0, 0.0, 0.0])
+            self.started_at = time.time()
+
+    def enable(self, enabled=True):
+        self.enabled = enabled
+        if enabled and (self._sampler is None or not self._sampler.is_alive()):
+            self._sampler = threading.Thread(target=self._sample_loop, name='rerun-profiler', daemon=True)
+            self._sampler.start()
+
+    def _sample_loop(self):
+        while self.enabled:
+            time.sleep(self.interval)
+            with self._lock:
+                active = dict(self._active)
+            if not active:
+                continue
+            frames = sys._current_frames()
+            sampled = [self._stack(frames[thread_id]) for thread_id in active if thread_id in frames]
+            with self._lock:
+                for stack in sampled:
+                    if stack:
+                        self.stacks[stack] += 1
+                        self.samples += 1
+
+    def _stack(self, frame):
+        labels = []
+        root_depth = None
+        while frame is not None:
+            labels.append(frame_label(frame))
+            if frame.f_code.co_filename.startswith(self.root_dir):
+                root_depth = len(labels)
+            frame = frame.f_back
+        if root_depth is None:
+            return None
+        # Outermost app frame first, as collapsed-stack tools expect
+        return tuple(reversed(labels[:root_depth]))[:MAX_DEPTH]
+
+    @contextmanager
+    def rerun(self, label='rerun'):
+        if not self.enabled:
+            yield
+            return
+        thread_id = threading.get_ident()
+        with self._lock:
+            self._active[thread_id] = label
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            with self._lock:
+                self._active.pop(thread_id, None)
+                self.reruns += 1
+                self.rerun_seconds += seconds
+
+    def track(self, func):
+        # Decorator recording calls and wall time; a flag check when disabled
+        name = func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not self.enabled:
+                return func(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                seconds = time.perf_counter() - started
+                with self._lock:
+                    entry = self.functions[name]
+                    entry[0] += 1
+                    entry[1] += seconds
+                    entry[2] = max(entry[2], seconds)
+        return wrapper
+
+    def hotspots(self, limit=25):
+        # Self samples count time spent in the frame itself; total samples
+        # include everything it called
+        with self._lock:
+            stacks = dict(self.stacks)
+            samples = self.samples
+        own = Counter()
+        total = Counter()
+        for stack, count in stacks.items():
+            own[stack[-1]] += count
+            for label in set(stack):
+                total[label] += count
+        rows = [
+            {
+                'Function': label,
+                'Self %': round(100 * own[label] / samples, 1),
+                'Total %': round(100 * count / samples, 1),
+                'Self (ms)': round(own[label] * self.interval * 1000, 1),
+                'Total (ms)': round(count * self.interval * 1000, 1),
+            }
+            for label, count in total.items()
+        ]
+        columns = ['Function', 'Self %', 'Total %', 'Self (ms)', 'Total (ms)']
+        frame = pd.DataFrame(rows, columns=columns)
+        return frame.sort_values(['Self %', 'Total %'], ascending=False).head(limit).reset_index(drop=True)
+
+    def function_timings(self):
+        with self._lock:
+            functions = {name: list(entry) for name, entry in self.functions.items()}
+        rows = [
+            {
+                'Function': name,
+                'Calls': calls,
+                'Total (ms)': round(seconds * 1000, 1),
+                'Avg (ms)': round(seconds / calls * 1000, 2),
+                'Max (ms)': round(longest * 1000, 1),
+            }
+            for name, (calls, seconds, longest) in functions.items()
+        ]
+        frame = pd.DataFrame(rows, columns=['Function', 'Calls', 'Total (ms)', 'Avg (ms)', 'Max (ms)'])
+        return frame.sort_values('Total (ms)', ascending=False).reset_index(drop=True)
+
+    def collapsed_stacks(self):
+        # One "frame;frame;frame count" line per distinct stack
+        with self._lock:
+            stacks = dict(self.stacks)
+        return ''.join(
+            ';'.join(label.replace(';', ':') for label in stack) + f" {count}\n"
+            for stack, count in sorted(stacks.items())
+        )
+
+
+# One profiler per process, off unless RESTAURANT_PROFILING=1 or enabled from the admin panel
+profiler = Profiler(os.path.dirname(os.path.abspath(__file__)))
+if os.environ.get('RESTAURANT_PROFILING', '0') == '1':
+    profiler.enable()
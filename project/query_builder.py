@@ -0,0 +1,175 @@
+# query_builder.py
+# One filter model for every analytics query. Filters compose SQLAlchemy Core
+# expressions instead of concatenated SQL strings, and each statement is built
+# once per filter shape (which optional filters are present) and reused with
+# fresh bind values, so reruns skip statement construction and hit
+# SQLAlchemy's compiled-statement cache.
+from functools import lru_cache
+
+from sqlalchemy import Integer, and_, bindparam, case, column, func, literal_column, select, table, type_coerce
+
+from column_types import DayNumber, MinuteOfDay, StatusCode
+
+ALL_SECTIONS = "All Sections"
+# Reservations that count as booked: upcoming ones and those already served
+BOOKED_STATUSES = ('confirmed', 'completed')
+
+# Lightweight table constructs; analytics do not need the ORM models. The
+# encoded columns carry their types so bind values and results are converted.
+reservations = table(
+    'reservations',
+    column('id'), column('date', DayNumber), column('time', MinuteOfDay), column('duration'),
+    column('table_id'), column('customer_id'), column('guest_count'), column('status', StatusCode),
+)
+tables = table('tables', column('id'), column('number'), column('capacity'), column('section_id'))
+sections = table('sections', column('id'), column('name'))
+
+# Reservations joined to their table and section, as every analytics query needs
+reservations_with_sections = reservations.outerjoin(
+    tables, reservations.c.table_id == tables.c.id
+).outerjoin(
+    sections, tables.c.section_id == sections.c.id
+)
+
+
+class AnalyticsFilter:
+    """Filter values for the analytics page; the shape decides the SQL."""
+
+    def __init__(self, start_date, end_date, section=ALL_SECTIONS, min_guests=None, max_guests=None,
+                 statuses=BOOKED_STATUSES):
+        self.start_date = start_date
+        self.end_date = end_date
+        self.section = section
+        self.min_guests = min_guests
+        self.max_guests = max_guests
+        self.statuses = tuple(statuses) if statuses is not None else None
+
+    @property
+    def shape(self):
+        return (
+            self.section not in (None, ALL_SECTIONS),
+            self.min_guests is not None and self.max_guests is not None,
+            self.statuses is not None,
+        )
+
+    def without(self, section=False, guests=False):
+        # Same filter with some criteria dropped (e.g. section popularity
+        # ignores the section filter)
+        return AnalyticsFilter(
+            self.start_date,
+            self.end_date,
+            ALL_SECTIONS if section else self.section,
+            None if guests else self.min_guests,
+            None if guests else self.max_guests,
+            self.statuses,
+        )
+
+    def params(self):
+        # Dates and statuses are encoded by the column types
+        return {
+            'start_date': self.start_date,
+            'end_date': self.end_date,
+            'section': self.section,
+            'min_guests': self.min_guests,
+            'max_guests': self.max_guests,
+            'statuses': list(self.statuses) if self.statuses is not None else None,
+        }
+
+
+def where_clause(shape):
+    has_section, has_guests, has_status = shape
+    criteria = [reservations.c.date.between(bindparam('start_date'), bindparam('end_date'))]
+    if has_status:
+        # Rendered inline so SQLite can match the partial index on booked rows
+        criteria.append(reservations.c.status.in_(bindparam('statuses', expanding=True, literal_execute=True)))
+    if has_section:
+        criteria.append(sections.c.name == bindparam('section'))
+    if has_guests:
+        criteria.append(reservations.c.guest_count.between(bindparam('min_guests'), bindparam('max_guests')))
+    return and_(*criteria)
+
+
+PARTY_SIZE = case(
+    (reservations.c.guest_count.between(1, 2), '1-2 guests'),
+    (reservations.c.guest_count.between(3, 4), '3-4 guests'),
+    (reservations.c.guest_count.between(5, 6), '5-6 guests'),
+    else_='7+ guests',
+)
+
+
+def _totals():
+    return select(func.count(reservations.c.id), func.sum(reservations.c.guest_count))
+
+
+def _by_date():
+    return select(reservations.c.date, func.count(reservations.c.id)).group_by(reservations.c.date)
+
+
+def _by_time():
+    return select(reservations.c.time, func.count(reservations.c.time)).group_by(reservations.c.time)
+
+
+def _by_section():
+    return select(sections.c.name, func.count(reservations.c.id)).group_by(sections.c.name)
+
+
+def _daily():
+    return select(
+        reservations.c.date.label('Date'), func.count(reservations.c.id).label('Reservations')
+    ).group_by(reservations.c.date).order_by(reservations.c.date)
+
+
+def _party_size():
+    party_size = PARTY_SIZE.label('Party_Size')
+    return select(party_size, func.count(reservations.c.id).label('Count')).group_by(literal_column('Party_Size'))
+
+
+def _section_reservations():
+    return select(
+        sections.c.name.label('Section'), func.count(reservations.c.id).label('Reservations')
+    ).group_by(sections.c.name)
+
+
+def _reservation_rows():
+    # Raw day numbers and minutes; the vectorized analytics work on integers
+    return select(
+        reservations.c.table_id,
+        type_coerce(reservations.c.date, Integer).label('date'),
+        type_coerce(reservations.c.time, Integer).label('time'),
+        func.coalesce(reservations.c.duration, bindparam('default_duration')).label('duration'),
+        reservations.c.guest_count,
+    )
+
+
+QUERIES = {
+    'totals': _totals,
+    'by_date': _by_date,
+    'by_time': _by_time,
+    'by_section': _by_section,
+    'daily': _daily,
+    'party_size': _party_size,
+    'section_reservations': _section_reservations,
+    'reservation_rows': _reservation_rows,
+}
+
+
+@lru_cache(maxsize=None)
+def statement(name, shape):
+    # Built once per (query, filter shape); bind values are supplied per call
+    return QUERIES[name]().select_from(reservations_with_sections).where(where_clause(shape))
+
+
+@lru_cache(maxsize=None)
+def tables_statement(has_section):
+    query = select(
+        tables.c.id.label('table_id'), tables.c.number, sections.c.name.label('section'), tables.c.capacity
+    ).select_from(tables.outerjoin(sections, tables.c.section_id == sections.c.id))
+    if has_section:
+        query = query.where(sections.c.name == bindparam('section'))
+    return query
+
+
+def run(connection, name, filters, **extra_params):
+    params = filters.params()
+    params.update(extra_params)
+    return connection.execute(statement(name, filters.shape), params)
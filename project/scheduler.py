@@ -0,0 +1,196 @@
+# scheduler.py
+# In-process scheduler for maintenance work that must stay off the request
+# path. Jobs run on a background thread at fixed intervals or daily times.
+# A lease table in a shared SQLite file gives single-flight execution, so
+# several app processes never run the same job twice.
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# How long a job may hold its lease before another process may take over
+DEFAULT_LEASE = 15 * 60
+TICK_SECONDS = 1.0
+
+
+class Job:
+    def __init__(self, name, func, interval=None, at=None, lease=DEFAULT_LEASE):
+        if (interval is None) == (at is None):
+            raise ValueError("A job needs exactly one of interval or at")
+        self.name = name
+        self.func = func
+        self.interval = interval
+        # Daily times as (hour, minute), e.g. at=['03:30']
+        self.at = sorted(tuple(int(part) for part in value.split(':')) for value in at) if at else None
+        self.lease = lease
+        self.runs = 0
+        self.failures = 0
+        self.skipped = 0
+        self.total_seconds = 0.0
+        self.last_seconds = None
+        self.last_started = None
+        self.last_error = None
+        # Last run by any process, as seen in the lease table
+        self.last_seen_run = 0.0
+        self.running = False
+
+    def due_at(self, now):
+        # Latest scheduled time <= now; the job is due if it last ran before it
+        if self.interval is not None:
+            return now - self.interval
+        current = datetime.fromtimestamp(now)
+        for day_offset in (0, -1):
+            day = current.date() + timedelta(days=day_offset)
+            for hour, minute in reversed(self.at):
+                scheduled = datetime.combine(day, datetime.min.time()).replace(hour=hour, minute=minute)
+                if scheduled <= current:
+                    return scheduled.timestamp()
+        return 0.0
+
+    def record(self, started, seconds, error=None):
+        self.runs += 1
+        self.last_started = started
+        self.last_seconds = seconds
+        self.total_seconds += seconds
+        if error is not None:
+            self.failures += 1
+            self.last_error = error
+
+
+class Scheduler:
+    """Runs registered jobs with cross-process single-flight leases."""
+
+    def __init__(self, lease_db_path, owner=None, tick=TICK_SECONDS):
+        self.lease_db_path = lease_db_path
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}"
+        self.tick = tick
+        self.jobs = {}
+        self._stop = threading.Event()
+        self._thread = None
+        self._init_leases()
+
+    def _connect(self):
+        return sqlite3.connect(self.lease_db_path, timeout=5)
+
+    def _init_leases(self):
+        os.makedirs(os.path.dirname(self.lease_db_path), exist_ok=True)
+        with self._connect() as connection:
+            connection.execute("""
+            CREATE TABLE IF NOT EXISTS job_leases (
+                name TEXT PRIMARY KEY,
+                owner TEXT,
+                expires_at REAL NOT NULL DEFAULT 0,
+                last_run_at REAL NOT NULL DEFAULT 0,
+                last_seconds REAL
+            )
+            """)
+
+    def register(self, name, func, interval=None, at=None, lease=DEFAULT_LEASE):
+        job = Job(name, func, interval=interval, at=at, lease=lease)
+        self.jobs[name] = job
+        with self._connect() as connection:
+            connection.execute("INSERT OR IGNORE INTO job_leases (name) VALUES (?)", (name,))
+            if at is not None:
+                # Daily jobs wait for their next scheduled time instead of
+                # catching up on first registration
+                connection.execute(
+                    "UPDATE job_leases SET last_run_at = ? WHERE name = ? AND last_run_at = 0",
+                    (time.time(), name),
+                )
+        return job
+
+    def _acquire(self, job, now, force=False):
+        # Take the lease only if nobody holds it and the job has not already
+        # run since it last became due (possibly in another process)
+        due_at = float('inf') if force else job.due_at(now)
+        with self._connect() as connection:
+            cursor = connection.execute("""
+            UPDATE job_leases SET owner = ?, expires_at = ?
+            WHERE name = ? AND expires_at < ? AND last_run_at < ?
+            """, (self.owner, now + job.lease, job.name, now, due_at))
+            if cursor.rowcount == 1:
+                return True
+            row = connection.execute(
+                "SELECT last_run_at FROM job_leases WHERE name = ?", (job.name,)
+            ).fetchone()
+            job.last_seen_run = row[0] if row else job.last_seen_run
+            return False
+
+    def _release(self, job, started, seconds):
+        with self._connect() as connection:
+            connection.execute("""
+            UPDATE job_leases SET expires_at = 0, last_run_at = ?, last_seconds = ?
+            WHERE name = ? AND owner = ?
+            """, (started, seconds, job.name, self.owner))
+
+    def run_job(self, name, force=False):
+        job = self.jobs[name]
+        now = time.time()
+        if not self._acquire(job, now, force):
+            job.skipped += 1
+            return False
+        job.running = True
+        started = time.perf_counter()
+        error = None
+        try:
+            job.func()
+        except Exception as e:
+            error = str(e)
+            logger.exception("Job %s failed", name)
+        finally:
+            seconds = time.perf_counter() - started
+            job.running = False
+            job.record(now, seconds, error)
+            self._release(job, now, seconds)
+        return True
+
+    def run_pending(self):
+        now = time.time()
+        for job in list(self.jobs.values()):
+            # Cheap local check first; the lease decides for real
+            if max(job.last_started or 0.0, job.last_seen_run) < job.due_at(now):
+                self.run_job(job.name)
+
+    def _loop(self):
+        while not self._stop.wait(self.tick):
+            try:
+                self.run_pending()
+            except Exception:
+                logger.exception("Scheduler tick failed")
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name='maintenance-scheduler', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def metrics(self):
+        rows = []
+        for job in self.jobs.values():
+            rows.append({
+                'Job': job.name,
+                'Schedule': f"every {job.interval:g}s" if job.interval is not None
+                else "daily at " + ", ".join(f"{h:02d}:{m:02d}" for h, m in job.at),
+                'Runs': job.runs,
+                'Failures': job.failures,
+                'Skipped': job.skipped,
+                'Last Run': datetime.fromtimestamp(job.last_started).strftime('%Y-%m-%d %H:%M:%S')
+                if job.last_started else '',
+                'Last (ms)': round(job.last_seconds * 1000, 1) if job.last_seconds is not None else None,
+                'Avg (ms)': round(job.total_seconds / job.runs * 1000, 1) if job.runs else None,
+                'Running': job.running,
+                'Last Error': job.last_error or '',
+            })
+        return pd.DataFrame(rows)
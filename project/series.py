@@ -0,0 +1,79 @@
+# series.py
+# Recurring reservations: expand a recurrence rule into occurrence dates and
+# check every occurrence for conflicts in one vectorized pass.
+from datetime import date
+
+import pandas as pd
+
+from analytics import DEFAULT_DURATION, minutes_of_day
+
+# Label -> (frequency, interval)
+REPEAT_OPTIONS = {
+    'Weekly': ('weekly', 1),
+    'Every 2 Weeks': ('weekly', 2),
+    'Monthly': ('monthly', 1),
+    'Daily': ('daily', 1),
+}
+# Upper bound on a single series, about two years of weekly bookings
+MAX_OCCURRENCES = 104
+# Frequency -> pandas DateOffset unit
+FREQUENCY_UNITS = {'daily': 'days', 'weekly': 'weeks', 'monthly': 'months'}
+
+
+def parse_exceptions(text):
+    if not text:
+        return []
+    return sorted(date.fromisoformat(value.strip()) for value in text.split(',') if value.strip())
+
+
+def format_exceptions(dates):
+    return ','.join(sorted(str(value) for value in dates))
+
+
+def occurrence_dates(start_date, frequency, interval=1, until=None, count=None, exceptions=()):
+    if until is None and count is None:
+        raise ValueError("A series needs an end date or an occurrence count")
+    try:
+        unit = FREQUENCY_UNITS[frequency]
+    except KeyError:
+        raise ValueError(f"Unknown frequency: {frequency}") from None
+    start = pd.Timestamp(start_date)
+    end = pd.Timestamp(until) if until is not None else None
+
+    # Every date is offset from the start rather than from the previous
+    # date, so a month-end clamp (Jan 31 -> Feb 29) does not carry over
+    # into Mar 29, Apr 29, ...; one date past the cap detects long series
+    dates = []
+    for step in range(min(count or MAX_OCCURRENCES + 1, MAX_OCCURRENCES + 1)):
+        value = start + pd.DateOffset(**{unit: interval * step})
+        if end is not None and value > end:
+            break
+        dates.append(value.date())
+    if len(dates) > MAX_OCCURRENCES:
+        raise ValueError(f"A series can have at most {MAX_OCCURRENCES} dates. Choose an earlier end date.")
+    skipped = set(exceptions)
+    return [value for value in dates if value not in skipped]
+
+
+def find_conflicts(occurrences, start_time, duration, existing):
+    # Map table_id -> conflicting occurrence dates. existing holds the
+    # reservations (table_id, date, time, duration) of every candidate table
+    # over the series' date range, fetched in a single query.
+    if existing.empty or not occurrences:
+        return {}
+    occurrence_keys = {str(value) for value in occurrences}
+    existing = existing[existing['date'].astype(str).isin(occurrence_keys)]
+    if existing.empty:
+        return {}
+
+    start = start_time.hour * 60 + start_time.minute
+    end = start + (duration or DEFAULT_DURATION)
+    existing_start = minutes_of_day(existing['time'])
+    existing_end = existing_start + existing['duration'].astype('float').fillna(DEFAULT_DURATION).to_numpy()
+    overlaps = (existing_start < end) & (start < existing_end)
+
+    conflicts = existing.loc[overlaps, ['table_id', 'date']]
+    return {
+        table_id: sorted(date.fromisoformat(str(value)[:10]) for value in set(group['date']))
+        for table_id, group in conflicts.groupby('table_id')
+    }
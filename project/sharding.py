@@ -0,0 +1,113 @@
+# sharding.py
+# Location-aware routing: every restaurant location gets its own SQLite file,
+# so bookings at one location never wait on another location's writer lock.
+import json
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+DEFAULT_LOCATION = 'Main'
+ALL_LOCATIONS = 'All Locations'
+REGISTRY_FILE = 'locations.json'
+
+
+def location_slug(name):
+    slug = re.sub(r'[^a-z0-9]+', '_', name.strip().lower()).strip('_')
+    if not slug:
+        raise ValueError(f"Invalid location name: {name!r}")
+    return slug
+
+
+class LocationRouter:
+    """Maps location names to per-location database files and engines."""
+
+    def __init__(self, data_dir, default_path, default_location=DEFAULT_LOCATION):
+        self.data_dir = data_dir
+        self.default_location = default_location
+        self._registry_path = os.path.join(data_dir, REGISTRY_FILE)
+        self._lock = threading.Lock()
+        # location name -> database file name (relative to data_dir)
+        self._files = {default_location: os.path.basename(default_path)}
+        # location name -> (engine, sessionmaker), created lazily
+        self._shards = {}
+        self._load_registry()
+
+    def _load_registry(self):
+        if not os.path.exists(self._registry_path):
+            return
+        with open(self._registry_path) as f:
+            self._files.update(json.load(f))
+
+    def _save_registry(self):
+        tmp_path = self._registry_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self._files, f, indent=2)
+        os.replace(tmp_path, self._registry_path)
+
+    def locations(self):
+        return list(self._files)
+
+    def resolve(self, location=None):
+        # Expand a location selection into the list of shards it covers
+        if location == ALL_LOCATIONS:
+            return self.locations()
+        return [location or self.default_location]
+
+    def path_for(self, location=None):
+        location = location or self.default_location
+        if location not in self._files:
+            raise KeyError(f"Unknown location: {location}")
+        return os.path.join(self.data_dir, self._files[location])
+
+    def add_location(self, name):
+        name = name.strip()
+        slug = location_slug(name)
+        file_name = f"restaurant_{slug}.db"
+        with self._lock:
+            if name in self._files:
+                return self.path_for(name)
+            # Snapshots, columnar stores and forecasts are named by slug, so
+            # two locations sharing one would share those files
+            existing = next((location for location in self._files if location_slug(location) == slug), None)
+            if existing is not None:
+                raise ValueError(f"Location name {name!r} is too similar to the existing location {existing!r}.")
+            if file_name in self._files.values():
+                raise ValueError(f"A location mapping to {file_name} already exists.")
+            self._files[name] = file_name
+            self._save_registry()
+        return self.path_for(name)
+
+    def _shard(self, location):
+        location = location or self.default_location
+        shard = self._shards.get(location)
+        if shard is None:
+            with self._lock:
+                shard = self._shards.get(location)
+                if shard is None:
+                    shard_engine = create_engine(f'sqlite:///{self.path_for(location)}')
+                    shard = (shard_engine, sessionmaker(bind=shard_engine))
+                    self._shards[location] = shard
+        return shard
+
+    def engine(self, location=None):
+        return self._shard(location)[0]
+
+    def sessionmaker(self, location=None):
+        return self._shard(location)[1]
+
+    def session(self, location=None):
+        return self.sessionmaker(location)()
+
+    def scatter(self, fn, location=None):
+        # Run fn(location) on every shard covered by the selection in parallel
+        # and return {location: result}
+        targets = self.resolve(location)
+        if len(targets) == 1:
+            return {targets[0]: fn(targets[0])}
+        with ThreadPoolExecutor(max_workers=min(len(targets), 8)) as pool:
+            results = pool.map(fn, targets)
+            return dict(zip(targets, results))
@@ -0,0 +1,116 @@
+# snapshots.py
+# Read-only analytics copies of the booking databases. Reporting queries run
+# against a snapshot taken with SQLite's online backup API, so long scans never
+# hold locks on the database that bookings are written to.
+import os
+import sqlite3
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+
+from sharding import location_slug
+
+SNAPSHOT_DIR = 'snapshots'
+# Pages copied per backup step; the source is only locked while a step runs
+BACKUP_STEP_PAGES = 256
+DEFAULT_MAX_AGE = timedelta(seconds=int(os.environ.get('ANALYTICS_SNAPSHOT_MAX_AGE', 300)))
+
+
+class AnalyticsSnapshot:
+    """A periodically refreshed, read-only copy of one database file."""
+
+    def __init__(self, source_path, snapshot_path, max_age=DEFAULT_MAX_AGE):
+        self.source_path = source_path
+        self.snapshot_path = snapshot_path
+        self.max_age = max_age
+        self._refresh_lock = threading.Lock()
+        self._engine = None
+        self._taken_at = None
+
+    @property
+    def taken_at(self):
+        # Survives restarts: the snapshot file's mtime is when it was swapped in
+        if self._taken_at is None and os.path.exists(self.snapshot_path):
+            self._taken_at = datetime.fromtimestamp(os.path.getmtime(self.snapshot_path))
+        return self._taken_at
+
+    def is_stale(self):
+        return self.taken_at is None or datetime.now() - self.taken_at > self.max_age
+
+    def refresh(self):
+        # Copy into a temporary file and atomically swap it in, so readers only
+        # ever see a complete snapshot
+        if not self._refresh_lock.acquire(blocking=self.taken_at is None):
+            # Another thread is already refreshing; keep serving the old copy
+            return self.taken_at
+        try:
+            os.makedirs(os.path.dirname(self.snapshot_path), exist_ok=True)
+            # Per writer: several app processes may refresh the same snapshot
+            tmp_path = f"{self.snapshot_path}.{os.getpid()}.{uuid.uuid4().hex}.tmp"
+            source = sqlite3.connect(self.source_path)
+            target = sqlite3.connect(tmp_path)
+            try:
+                try:
+                    source.backup(target, pages=BACKUP_STEP_PAGES)
+                finally:
+                    target.close()
+                    source.close()
+                os.replace(tmp_path, self.snapshot_path)
+            except BaseException:
+                # Unique names are never reused, so a failed copy would stay behind
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            self._taken_at = datetime.now()
+            # Pooled connections still point at the replaced file
+            if self._engine is not None:
+                self._engine.dispose()
+            return self._taken_at
+        finally:
+            self._refresh_lock.release()
+
+    def ensure_fresh(self):
+        if self.is_stale():
+            self.refresh()
+        return self.taken_at
+
+    def engine(self):
+        if self._engine is None:
+            self._engine = create_engine(
+                f'sqlite:///file:{self.snapshot_path}?mode=ro&uri=true'
+            )
+        return self._engine
+
+
+class SnapshotManager:
+    """Keeps one analytics snapshot per location known to a LocationRouter."""
+
+    def __init__(self, router, max_age=DEFAULT_MAX_AGE):
+        self.router = router
+        self.max_age = max_age
+        self._snapshots = {}
+        self._lock = threading.Lock()
+
+    def get(self, location=None):
+        location = location or self.router.default_location
+        with self._lock:
+            snapshot = self._snapshots.get(location)
+            if snapshot is None:
+                snapshot_path = os.path.join(
+                    self.router.data_dir, SNAPSHOT_DIR, f"{location_slug(location)}.db"
+                )
+                snapshot = AnalyticsSnapshot(self.router.path_for(location), snapshot_path, self.max_age)
+                self._snapshots[location] = snapshot
+        return snapshot
+
+    def data_as_of(self, location=None):
+        # Oldest snapshot among the selected locations, i.e. what every figure reflects
+        timestamps = [self.get(loc).taken_at for loc in self.router.resolve(location)]
+        timestamps = [taken_at for taken_at in timestamps if taken_at is not None]
+        return min(timestamps) if timestamps else None
+
+    def refresh(self, location=None):
+        for loc in self.router.resolve(location):
+            self.get(loc).refresh()
@@ -0,0 +1,123 @@
+# state_store.py
+# Process-wide store for heavy, shareable data. Browser sessions keep only
+# small references (ids, page cursors, slot records) and look the data up
+# here, so memory grows with the data set rather than sessions x data set.
+import sys
+import threading
+import time
+from collections import defaultdict, namedtuple
+
+import pandas as pd
+
+# How long a cached entry may serve reads before it is reloaded, so writes
+# made by other app processes still show up
+DEFAULT_MAX_AGE = 30
+# Sessions not seen for this long are dropped from the memory report
+SESSION_EXPIRY = 60 * 60
+
+# Compact stand-in for ORM Table rows kept in session state
+TableSlot = namedtuple('TableSlot', ['id', 'number', 'capacity'])
+
+
+def table_slots(tables):
+    return [TableSlot(table.id, table.number, table.capacity) for table in tables]
+
+
+def deep_sizeof(obj, seen=None):
+    # Approximate retained size of obj in bytes
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(deep=True).sum())
+    if isinstance(obj, pd.Series):
+        return int(obj.memory_usage(deep=True))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    elif hasattr(obj, '__dict__'):
+        size += deep_sizeof(vars(obj), seen)
+    return size
+
+
+class SharedStore:
+    """Version-keyed cache shared by every session in the process."""
+
+    def __init__(self, max_age=DEFAULT_MAX_AGE):
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._versions = defaultdict(int)
+        # (name, location) -> (version, loaded_at, value)
+        self._entries = {}
+        # (name, location) -> lock, so concurrent sessions load an entry once
+        self._load_locks = defaultdict(threading.Lock)
+        # session id -> (last seen, {state key: bytes})
+        self._sessions = {}
+
+    def version(self, location):
+        return self._versions[location]
+
+    def bump(self, location):
+        # Called after every write so the next read reloads
+        with self._lock:
+            self._versions[location] += 1
+
+    def _fresh(self, key, version):
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == version and time.monotonic() - entry[1] < self.max_age:
+            return entry
+        return None
+
+    def get(self, name, location, loader):
+        key = (name, location)
+        version = self.version(location)
+        entry = self._fresh(key, version)
+        if entry is None:
+            with self._lock:
+                load_lock = self._load_locks[key]
+            with load_lock:
+                entry = self._fresh(key, version)
+                if entry is None:
+                    entry = (version, time.monotonic(), loader())
+                    # Replacing the entry drops the previous version
+                    self._entries[key] = entry
+        return entry[2]
+
+    def record_session(self, session_id, state):
+        footprint = {key: deep_sizeof(value) for key, value in state.items()}
+        now = time.monotonic()
+        with self._lock:
+            self._sessions[session_id] = (now, footprint)
+            for stale_id in [sid for sid, (seen, _) in self._sessions.items() if now - seen > SESSION_EXPIRY]:
+                del self._sessions[stale_id]
+
+    def memory_report(self):
+        # (sessions, shared entries) DataFrames with sizes in bytes
+        with self._lock:
+            sessions = dict(self._sessions)
+            entries = dict(self._entries)
+        session_rows = [
+            {
+                'Session': session_id[:8],
+                'Keys': len(footprint),
+                'Bytes': sum(footprint.values()),
+                'Largest Key': max(footprint, key=footprint.get) if footprint else '',
+            }
+            for session_id, (_, footprint) in sessions.items()
+        ]
+        entry_rows = [
+            {'Entry': name, 'Location': location, 'Version': version, 'Bytes': deep_sizeof(value)}
+            for (name, location), (version, _, value) in entries.items()
+        ]
+        return (
+            pd.DataFrame(session_rows, columns=['Session', 'Keys', 'Bytes', 'Largest Key']),
+            pd.DataFrame(entry_rows, columns=['Entry', 'Location', 'Version', 'Bytes']),
+        )
+
+
+# One store per process; imported modules survive Streamlit reruns
+shared_store = SharedStore()
@@ -0,0 +1,91 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, text
+
+import query_builder
+from column_types import STATUS_CODES, day_number
+from query_builder import ALL_SECTIONS, AnalyticsFilter
+from snapshots import AnalyticsSnapshot
+
+pytest.importorskip('pyarrow')
+from columnar import ColumnarStore, install_change_log  # noqa: E402
+
+FIRST_DAY = date(2023, 1, 1)
+ROWS = 30000
+
+
+@pytest.fixture(scope='module')
+def databases(tmp_path_factory):
+    # A booking database with every 97th reservation on no table, and a
+    # columnar store built from its snapshot
+    data_dir = tmp_path_factory.mktemp('columnar')
+    source_path = str(data_dir / 'restaurant.db')
+    engine = create_engine(f"sqlite:///{source_path}")
+    rng = np.random.default_rng(7)
+    with engine.begin() as connection:
+        for statement in [
+            "CREATE TABLE sections (id INTEGER PRIMARY KEY, name VARCHAR(50))",
+            "CREATE TABLE tables (id INTEGER PRIMARY KEY, number INTEGER, capacity INTEGER, section_id INTEGER)",
+            "CREATE TABLE reservations (id INTEGER PRIMARY KEY, date INTEGER, time INTEGER, duration INTEGER, "
+            "table_id INTEGER, customer_id INTEGER, guest_count INTEGER, status INTEGER, series_id INTEGER)",
+            "INSERT INTO sections VALUES (1, 'Main Floor'), (2, 'Patio')",
+            "INSERT INTO tables VALUES (1, 1, 4, 1), (2, 2, 6, 1), (3, 3, 4, 2)",
+        ]:
+            connection.execute(text(statement))
+        install_change_log(connection)
+        table_ids = rng.integers(1, 4, ROWS).astype(object)
+        table_ids[::97] = None
+        connection.execute(text(
+            "INSERT INTO reservations (date, time, duration, table_id, customer_id, guest_count, status) "
+            "VALUES (:date, :time, :duration, :table_id, 1, :guest_count, :status)"
+        ), [
+            {'date': day_number(FIRST_DAY) + int(day), 'time': int(minute), 'duration': int(duration),
+             'table_id': table_id, 'guest_count': int(guests), 'status': int(status)}
+            for day, minute, duration, table_id, guests, status in zip(
+                rng.integers(0, 730, ROWS), rng.integers(44, 88, ROWS) * 15, rng.choice([60, 90, 120], ROWS),
+                table_ids, rng.integers(1, 9, ROWS),
+                rng.choice([STATUS_CODES['confirmed'], STATUS_CODES['completed'], STATUS_CODES['cancelled']], ROWS),
+            )
+        ])
+    snapshot = AnalyticsSnapshot(source_path, str(data_dir / 'snapshot.db'))
+    store = ColumnarStore(snapshot, engine, str(data_dir / 'store'))
+    store.refresh()
+    yield snapshot, store
+    snapshot.engine().dispose()
+    engine.dispose()
+
+
+FILTERS = [
+    AnalyticsFilter(date(2023, 3, 10), date(2024, 3, 9)),
+    AnalyticsFilter(date(2023, 3, 10), date(2024, 3, 9), 'Patio'),
+    AnalyticsFilter(date(2023, 1, 1), date(2024, 12, 31), ALL_SECTIONS, 2, 4),
+    AnalyticsFilter(date(2024, 2, 1), date(2024, 2, 29), 'Main Floor', 1, 6),
+    AnalyticsFilter(date(2023, 6, 15), date(2024, 6, 14), ALL_SECTIONS, 1, 20, statuses=['completed']),
+]
+
+
+@pytest.mark.parametrize('name', [name for name in query_builder.QUERIES if name != 'reservation_rows'])
+@pytest.mark.parametrize('filters', FILTERS, ids=lambda filters: f"{filters.section}-{filters.min_guests}")
+def test_columnar_matches_sqlite(databases, name, filters):
+    snapshot, store = databases
+    with snapshot.engine().connect() as connection:
+        expected = [tuple(row) for row in query_builder.run(connection, name, filters).fetchall()]
+    assert store.run(name, filters) == expected
+
+
+def test_reservation_rows_match_sqlite(databases):
+    snapshot, store = databases
+    filters = FILTERS[0]
+    with snapshot.engine().connect() as connection:
+        rows = query_builder.run(connection, 'reservation_rows', filters, default_duration=120)
+        expected = pd.DataFrame(rows.fetchall(), columns=list(rows.keys()))
+    columns = ['date', 'time', 'table_id', 'guest_count']
+    # Both return raw day and minute numbers
+    expected = expected.assign(table_id=expected['table_id'].fillna(-1)).sort_values(columns, ignore_index=True)
+    actual = store.run('reservation_rows', filters)
+    actual = actual.assign(table_id=actual['table_id'].fillna(-1)).sort_values(columns, ignore_index=True)
+    for column in columns + ['duration']:
+        assert actual[column].astype('int64').tolist() == expected[column].astype('int64').tolist()
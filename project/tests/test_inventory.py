@@ -0,0 +1,81 @@
+from datetime import date, time, timedelta
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, text
+
+import inventory
+from column_types import STATUS_CODES, day_number
+from series import find_conflicts
+
+TODAY = date(2024, 3, 1)
+CONFIRMED = STATUS_CODES['confirmed']
+
+
+@pytest.fixture
+def connection(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'inventory.db'}")
+    with engine.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE reservations (id INTEGER PRIMARY KEY, table_id INTEGER, date INTEGER, "
+            "time INTEGER, duration INTEGER, status INTEGER, series_id INTEGER)"
+        ))
+        yield connection
+    engine.dispose()
+
+
+def book(connection, reservation_id, table_id, day, start, series_id=None):
+    connection.execute(text(
+        "INSERT INTO reservations (id, table_id, date, time, duration, status, series_id) "
+        "VALUES (:id, :table_id, :date, :time, 120, :status, :series_id)"
+    ), {
+        'id': reservation_id, 'table_id': table_id, 'date': day_number(day),
+        'time': start.hour * 60 + start.minute, 'status': CONFIRMED, 'series_id': series_id,
+    })
+
+
+def test_series_conflicts_follow_cells_not_minutes(connection):
+    inventory.extend(connection, [1, 2], today=TODAY)
+    days = [TODAY + timedelta(weeks=week) for week in range(3)]
+    # 19:15-21:15 ends inside the 21:00 cell a 21:15 series starts in
+    book(connection, 1, 1, days[1], time(19, 15))
+    assert inventory.claim(connection, 1, 1, days[1], time(19, 15))
+
+    existing = pd.DataFrame(
+        [(1, days[1], 19 * 60 + 15, 120)], columns=['table_id', 'date', 'time', 'duration'],
+    )
+    assert find_conflicts(days, time(21, 15), 120, existing) == {}
+    assert inventory.blocked_days(connection, [1, 2], days, time(21, 15)) == {1: {days[1]}}
+
+    # Skipping the blocked date lets the claim succeed
+    free_days = [day for day in days if day != days[1]]
+    for reservation_id, day in enumerate(free_days, start=10):
+        book(connection, reservation_id, 1, day, time(21, 15), series_id=7)
+    assert inventory.claim_series(connection, 7, 1, free_days, time(21, 15))
+
+
+def test_held_cells_block_their_date(connection):
+    inventory.extend(connection, [1], today=TODAY)
+    days = [TODAY, TODAY + timedelta(days=1)]
+    assert inventory.hold(connection, 'host-a', 1, days[0], time(20, 0), now=1000.0)
+    assert inventory.blocked_days(connection, [1], days, time(21, 0), now=1001.0) == {1: {days[0]}}
+    # Expired holds no longer block
+    assert inventory.blocked_days(connection, [1], days, time(21, 0), now=1000.0 + inventory.HOLD_SECONDS) == {}
+
+
+def test_covered_days(connection):
+    inventory.extend(connection, [1], today=TODAY)
+    beyond = TODAY + timedelta(days=inventory.HORIZON_DAYS)
+    assert inventory.covered_days(connection, [TODAY, beyond]) == {TODAY}
+
+
+def test_extend_backfills_tables_added_later(connection):
+    inventory.extend(connection, [1], today=TODAY)
+    book(connection, 1, 2, TODAY, time(19, 0))
+    # A later run adds no days but gives table 2 cells across the horizon
+    assert inventory.extend(connection, [1, 2], today=TODAY) == 0
+    last_day = TODAY + timedelta(days=inventory.HORIZON_DAYS - 1)
+    assert inventory.blocked_days(connection, [2], [TODAY, last_day], time(19, 0)) == {2: {TODAY}}
+    assert not inventory.claim(connection, 2, 2, TODAY, time(20, 0))
+    assert inventory.claim(connection, 3, 2, last_day, time(20, 0))
+    assert inventory.blocked_days(connection, [2], [last_day], time(20, 0)) == {2: {last_day}}
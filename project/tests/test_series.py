@@ -0,0 +1,43 @@
+from datetime import date, timedelta
+
+import pytest
+
+from series import MAX_OCCURRENCES, occurrence_dates
+
+
+def test_monthly_series_keeps_its_day_after_a_short_month():
+    dates = occurrence_dates(date(2024, 1, 31), 'monthly', until=date(2024, 6, 30))
+    assert dates == [
+        date(2024, 1, 31), date(2024, 2, 29), date(2024, 3, 31),
+        date(2024, 4, 30), date(2024, 5, 31), date(2024, 6, 30),
+    ]
+
+
+def test_monthly_series_by_count():
+    dates = occurrence_dates(date(2023, 8, 31), 'monthly', interval=2, count=4)
+    assert dates == [date(2023, 8, 31), date(2023, 10, 31), date(2023, 12, 31), date(2024, 2, 29)]
+
+
+def test_weekly_series_skips_exceptions():
+    dates = occurrence_dates(date(2024, 3, 1), 'weekly', until=date(2024, 3, 29), exceptions={date(2024, 3, 15)})
+    assert dates == [date(2024, 3, 1), date(2024, 3, 8), date(2024, 3, 22), date(2024, 3, 29)]
+
+
+def test_series_at_the_cap_is_accepted():
+    start = date(2024, 1, 1)
+    dates = occurrence_dates(start, 'weekly', until=start + timedelta(weeks=MAX_OCCURRENCES - 1))
+    assert len(dates) == MAX_OCCURRENCES
+    assert dates[-1] == start + timedelta(weeks=MAX_OCCURRENCES - 1)
+
+
+def test_series_past_the_cap_is_rejected():
+    start = date(2024, 1, 1)
+    with pytest.raises(ValueError, match=str(MAX_OCCURRENCES)):
+        occurrence_dates(start, 'weekly', until=start + timedelta(weeks=MAX_OCCURRENCES))
+    with pytest.raises(ValueError, match=str(MAX_OCCURRENCES)):
+        occurrence_dates(start, 'daily', count=MAX_OCCURRENCES + 1)
+
+
+def test_series_needs_an_end():
+    with pytest.raises(ValueError):
+        occurrence_dates(date(2024, 1, 1), 'weekly')
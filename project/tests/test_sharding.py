@@ -0,0 +1,28 @@
+import pytest
+
+from sharding import LocationRouter, location_slug
+
+
+@pytest.fixture
+def router(tmp_path):
+    return LocationRouter(str(tmp_path), str(tmp_path / 'restaurant.db'))
+
+
+def test_add_location_registers_a_new_file(router, tmp_path):
+    assert router.add_location('  Harbor View ') == str(tmp_path / 'restaurant_harbor_view.db')
+    assert router.locations() == ['Main', 'Harbor View']
+    # Reloaded from the registry
+    assert LocationRouter(str(tmp_path), str(tmp_path / 'restaurant.db')).locations() == ['Main', 'Harbor View']
+
+
+def test_existing_name_returns_its_path(router, tmp_path):
+    assert router.add_location('Main') == str(tmp_path / 'restaurant.db')
+    assert router.locations() == ['Main']
+
+
+@pytest.mark.parametrize('name', ['main', 'MAIN!', ' Main_ '])
+def test_name_with_an_existing_slug_is_rejected(router, name):
+    assert location_slug(name) == location_slug('Main')
+    with pytest.raises(ValueError, match='too similar'):
+        router.add_location(name)
+    assert router.locations() == ['Main']
@@ -0,0 +1,37 @@
+import sqlite3
+import threading
+
+from snapshots import AnalyticsSnapshot
+
+
+def test_concurrent_refreshes_each_write_their_own_copy(tmp_path):
+    # Two writers (as two app processes would) refreshing the same snapshot
+    source_path = str(tmp_path / 'restaurant.db')
+    connection = sqlite3.connect(source_path)
+    connection.execute("CREATE TABLE reservations (id INTEGER PRIMARY KEY, guest_count INTEGER)")
+    connection.executemany("INSERT INTO reservations (guest_count) VALUES (?)", [(n % 8 + 1,) for n in range(20000)])
+    connection.commit()
+    connection.close()
+
+    snapshot_path = str(tmp_path / 'snapshots' / 'main.db')
+    writers = [AnalyticsSnapshot(source_path, snapshot_path) for _ in range(4)]
+    errors = []
+
+    def refresh(writer):
+        try:
+            for _ in range(5):
+                writer.refresh()
+        except Exception as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=refresh, args=(writer,)) for writer in writers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert sorted(path.name for path in (tmp_path / 'snapshots').iterdir()) == ['main.db']
+    copy = sqlite3.connect(snapshot_path)
+    assert copy.execute("SELECT COUNT(*) FROM reservations").fetchone()[0] == 20000
+    copy.close()